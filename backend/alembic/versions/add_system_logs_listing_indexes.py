@@ -0,0 +1,42 @@
+"""Add composite indexes for system log listing and entity lookups
+
+Revision ID: add_system_logs_listing_indexes
+Revises: 8478ae0841e8
+Create Date: 2025-07-22
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_system_logs_listing_indexes'
+down_revision: Union[str, Sequence[str], None] = '8478ae0841e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Serve newest-first filtered listings, stats and entity lookups from indexes"""
+    op.create_index(
+        'idx_logs_created_level_category',
+        'system_logs',
+        [sa.text('created_at DESC'), 'level', 'category']
+    )
+    op.create_index(
+        'idx_logs_entity',
+        'system_logs',
+        ['entity_type', 'entity_id'],
+        postgresql_where=sa.text('entity_id IS NOT NULL')
+    )
+    # Its columns are a prefix of the new composite index
+    op.drop_index('idx_logs_created_level', table_name='system_logs')
+
+
+def downgrade() -> None:
+    """Restore the previous created_at/level index"""
+    op.create_index('idx_logs_created_level', 'system_logs', ['created_at', 'level'], unique=False)
+    op.drop_index('idx_logs_entity', table_name='system_logs')
+    op.drop_index('idx_logs_created_level_category', table_name='system_logs')
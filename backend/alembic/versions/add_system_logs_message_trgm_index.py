@@ -0,0 +1,34 @@
+"""Add a trigram index for system log message search
+
+Revision ID: add_system_logs_message_trgm_index
+Revises: add_system_logs_listing_indexes
+Create Date: 2025-07-22
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_system_logs_message_trgm_index'
+down_revision: Union[str, Sequence[str], None] = 'add_system_logs_listing_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Let ILIKE '%term%' log message searches use an index instead of a seq scan"""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'idx_logs_message_trgm',
+        'system_logs',
+        ['message'],
+        postgresql_using='gin',
+        postgresql_ops={'message': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Drop the trigram index"""
+    op.drop_index('idx_logs_message_trgm', table_name='system_logs')
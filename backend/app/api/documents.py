@@ -2,10 +2,9 @@
 from typing import Optional
 import uuid
 import math
-from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
@@ -111,8 +110,7 @@ async def get_document_by_share_token(
         )
     
     # Update last accessed timestamp
-    document.last_accessed_at = datetime.utcnow()
-    await db.commit()
+    DocumentService.mark_accessed(document)
     
     return document
 
@@ -187,9 +185,9 @@ async def export_document_bibtex(
 ):
     """Export all papers assigned to a document as BibTeX."""
     try:
-        bibtex_content = await ExportService.export_document_bibtex(db, document_id, user_id)
-        return PlainTextResponse(
-            content=bibtex_content,
+        bibtex_chunks = await ExportService.export_document_bibtex(db, document_id, user_id)
+        return StreamingResponse(
+            bibtex_chunks,
             media_type="application/x-bibtex",
             headers={
                 "Content-Disposition": f"attachment; filename=document_{document_id}_bibliography.bib"
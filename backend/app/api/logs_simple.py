@@ -4,13 +4,16 @@ from datetime import datetime, timedelta
 from uuid import UUID
 
 from fastapi import APIRouter, Query, HTTPException
-from sqlalchemy import select, and_, or_, func, delete
+from sqlalchemy import select, and_, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
 from app.db.session import get_db
 from app.models.system_log import SystemLog, LogLevel, LogCategory
 from app.schemas.system_log import SystemLogList
+from app.services.logging_service import (
+    DELETE_BATCH_SIZE, log_stats_query, old_logs_batch_delete, split_log_stats
+)
 
 router = APIRouter()
 
@@ -31,8 +34,8 @@ async def get_logs(
 ) -> SystemLogList:
     """Get paginated system logs."""
     
-    # Build query
-    query = select(SystemLog)
+    # Build query; the total comes from a window count over the same scan as the page
+    query = select(SystemLog, func.count().over().label("total"))
     
     # Apply filters
     filters = []
@@ -51,6 +54,7 @@ async def get_logs(
     if end_date:
         filters.append(SystemLog.created_at <= end_date)
     if search:
+        # Substring search, served by the message trigram index
         filters.append(SystemLog.message.ilike(f"%{search}%"))
     
     if filters:
@@ -59,21 +63,26 @@ async def get_logs(
     # Order by created_at descending
     query = query.order_by(SystemLog.created_at.desc())
     
-    # Get total count
-    count_query = select(func.count()).select_from(SystemLog)
-    if filters:
-        count_query = count_query.where(and_(*filters))
-    
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-    
     # Apply pagination
     offset = (page - 1) * per_page
     query = query.offset(offset).limit(per_page)
     
     # Execute query
     result = await db.execute(query)
-    logs = result.scalars().all()
+    rows = result.all()
+    logs = [row.SystemLog for row in rows]
+    
+    if rows:
+        total = rows[0].total
+    elif page > 1:
+        # A page past the end has no rows to carry the total
+        count_query = select(func.count()).select_from(SystemLog)
+        if filters:
+            count_query = count_query.where(and_(*filters))
+        total_result = await db.execute(count_query)
+        total = total_result.scalar()
+    else:
+        total = 0
     
     # Calculate total pages
     total_pages = (total + per_page - 1) // per_page if total > 0 else 0
@@ -114,34 +123,9 @@ async def get_log_stats(
     
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    # Get counts by level
-    level_stats_query = select(
-        SystemLog.level,
-        func.count(SystemLog.id).label('count')
-    ).where(
-        SystemLog.created_at >= start_date
-    ).group_by(SystemLog.level)
-    
-    level_result = await db.execute(level_stats_query)
-    level_stats = {row.level: row.count for row in level_result}
-    
-    # Get counts by category
-    category_stats_query = select(
-        SystemLog.category,
-        func.count(SystemLog.id).label('count')
-    ).where(
-        SystemLog.created_at >= start_date
-    ).group_by(SystemLog.category)
-    
-    category_result = await db.execute(category_stats_query)
-    category_stats = {row.category: row.count for row in category_result}
-    
-    # Get total count
-    total_query = select(func.count(SystemLog.id)).where(
-        SystemLog.created_at >= start_date
-    )
-    total_result = await db.execute(total_query)
-    total_count = total_result.scalar()
+    # Counts by level, by category and in total from one grouped query
+    result = await db.execute(log_stats_query(start_date))
+    total_count, level_stats, category_stats = split_log_stats(result)
     
     return {
         "days": days,
@@ -162,12 +146,15 @@ async def delete_old_logs(
     
     cutoff_date = datetime.utcnow() - timedelta(days=days)
     
-    # Delete old logs
-    delete_query = delete(SystemLog).where(SystemLog.created_at < cutoff_date)
-    result = await db.execute(delete_query)
-    await db.commit()
-    
-    deleted_count = result.rowcount
+    # Delete old logs in batches so each transaction stays small
+    delete_query = old_logs_batch_delete(cutoff_date)
+    deleted_count = 0
+    while True:
+        result = await db.execute(delete_query)
+        await db.commit()
+        deleted_count += result.rowcount
+        if result.rowcount < DELETE_BATCH_SIZE:
+            break
     
     return {
         "deleted_count": deleted_count,
@@ -15,6 +15,7 @@ from app.models import Paper, User
 from app.schemas.paper import PaperCreate, PaperUpdate, PaperResponse, PaperListResponse
 from app.services.paper_processor import PaperProcessorService
 from app.services.background_processor import background_processor
+from app.services.citation_engine import invalidate_suggestion_cache
 from app.core.config import settings
 
 router = APIRouter(prefix="/papers", tags=["papers"])
@@ -278,6 +279,7 @@ async def update_paper(
     
     await db.commit()
     await db.refresh(paper)
+    await invalidate_suggestion_cache()
     
     # Compute chunk count
     chunk_count = 0
@@ -308,6 +310,7 @@ async def delete_paper(
     
     await db.delete(paper)
     await db.commit()
+    await invalidate_suggestion_cache()
     
     return {"message": "Paper deleted successfully"}
 
@@ -1,7 +1,7 @@
 """WebSocket endpoints for real-time citation suggestions."""
 from typing import Dict, Set
-import json
 import asyncio
+import orjson
 from fastapi import WebSocket, WebSocketDisconnect, Depends, Query
 from fastapi.websockets import WebSocketState
 from app.core.config import settings
@@ -42,7 +42,7 @@ class ConnectionManager:
             websocket = self.active_connections[user_id]
             if websocket.client_state == WebSocketState.CONNECTED:
                 try:
-                    await websocket.send_json(message)
+                    await websocket.send_text(orjson.dumps(message).decode())
                 except Exception as e:
                     logger.error(f"Error sending message to user {user_id}: {e}")
                     self.disconnect(user_id)
@@ -71,6 +71,15 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 
+async def _receive_json(websocket: WebSocket):
+    """Receive a JSON message from a text or binary frame."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    text = message.get("text")
+    return orjson.loads(text if text is not None else message["bytes"])
+
+
 async def websocket_citation_endpoint(
     websocket: WebSocket,
     user_id: str = Query(...)
@@ -89,7 +98,7 @@ async def websocket_citation_endpoint(
         
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
+            data = await _receive_json(websocket)
             
             # Check rate limit
             if not manager.check_rate_limit(user_id):
@@ -57,6 +57,8 @@ class Settings(BaseSettings):
     embedding_dimension: int = Field(default=384)
     chunk_size: int = Field(default=500)
     chunk_overlap: int = Field(default=50)
+    embedding_onnx_dir: str = Field(default="")  # Directory with quantized model.onnx + tokenizer
+    embedding_onnx_threads: int = Field(default=4)
     
     # Logging
     log_level: str = Field(default="INFO")
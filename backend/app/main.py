@@ -8,6 +8,9 @@ from app.core.config import settings
 from app.api import health, documents, papers, zotero, logs_simple as logs, document_papers, admin
 from app.api.websocket import websocket_citation_endpoint
 from app.services.background_processor import background_processor
+from app.services.document import document_access_tracker
+from app.services.external_metadata_service import close_http_client
+from app.services.paper_processor import shutdown_extract_pool
 
 
 @asynccontextmanager
@@ -35,12 +38,17 @@ async def lifespan(app: FastAPI):
     await background_processor.start()
     print("Background PDF processor started")
     
+    await document_access_tracker.start()
+    
     yield
     
     # Shutdown
     print("Shutting down application")
     await background_processor.stop()
     print("Background PDF processor stopped")
+    await document_access_tracker.stop()
+    await close_http_client()
+    await shutdown_extract_pool()
 
 
 # Create FastAPI app instance
@@ -4,7 +4,7 @@ from datetime import datetime
 from typing import Optional, Dict, Any, TYPE_CHECKING
 from enum import Enum
 
-from sqlalchemy import String, DateTime, Text, JSON, Index, Enum as SQLEnum
+from sqlalchemy import String, DateTime, Text, JSON, Index, Enum as SQLEnum, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy import ForeignKey
@@ -72,7 +72,9 @@ class SystemLog(Base):
     
     # Indexes for efficient querying
     __table_args__ = (
-        Index('idx_logs_created_level', 'created_at', 'level'),
+        # Newest-first listing filtered by level/category, and the stats/cleanup date ranges
+        Index('idx_logs_created_level_category', text('created_at DESC'), 'level', 'category'),
+        Index('idx_logs_entity', 'entity_type', 'entity_id', postgresql_where=text('entity_id IS NOT NULL')),
         Index('idx_logs_category_created', 'category', 'created_at'),
         Index('idx_logs_user_created', 'user_id', 'created_at'),
     )
@@ -9,6 +9,7 @@ from app.models.document_paper import DocumentPaper
 from app.models.paper import Paper
 from app.models.paper_chunk import PaperChunk
 from app.models.system_log import SystemLog, LogLevel, LogCategory
+from app.services.citation_engine import invalidate_suggestion_cache
 
 
 class AdminService:
@@ -87,6 +88,7 @@ class AdminService:
         db.add(log_entry)
         
         await db.commit()
+        await invalidate_suggestion_cache()
         
         return {
             "papers_deleted": paper_count,
@@ -4,8 +4,9 @@ import logging
 from datetime import datetime, timedelta
 from typing import Optional
 import threading
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, update, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
 
 from app.models import Paper
 from app.db.session import AsyncSessionLocal
@@ -13,6 +14,8 @@ from .paper_processor import PaperProcessorService
 
 logger = logging.getLogger(__name__)
 
+PROCESS_BATCH_SIZE = 4  # Papers fed through the processing pipeline together
+
 
 class BackgroundProcessor:
     """Handles background processing of PDFs."""
@@ -68,7 +71,7 @@ class BackgroundProcessor:
             try:
                 # Find unprocessed papers
                 result = await db.execute(
-                    select(Paper).where(
+                    select(Paper).options(defer(Paper.full_text)).where(
                         and_(
                             Paper.file_path.isnot(None),
                             Paper.is_processed == False,
@@ -79,39 +82,50 @@ class BackgroundProcessor:
                                 Paper.updated_at < datetime.utcnow() - timedelta(minutes=30)
                             )
                         )
-                    ).limit(1)  # Process one at a time
+                    ).limit(PROCESS_BATCH_SIZE)  # Stages of different papers overlap in the pipeline
                 )
                 
-                paper = result.scalar_one_or_none()
+                papers = result.scalars().all()
                 
-                if not paper:
+                if not papers:
                     return 0
                     
-                logger.info(f"Processing paper: {paper.title[:60]}...")
+                logger.info(f"Processing {len(papers)} papers: {', '.join(p.title[:30] for p in papers)}...")
                 
                 try:
                     # Clear any previous error
-                    paper.processing_error = None
+                    for paper in papers:
+                        paper.processing_error = None
                     await db.commit()
                     
-                    # Process the paper
-                    await PaperProcessorService.process_paper(
-                        paper_id=str(paper.id),
-                        file_path=paper.file_path
+                    # Process the papers
+                    await PaperProcessorService.process_papers(
+                        [(str(paper.id), paper.file_path) for paper in papers]
                     )
                     
-                    logger.info(f"✅ Successfully processed: {paper.title[:60]}")
-                    return 1
+                    logger.info(f"✅ Processed batch of {len(papers)} papers")
+                    return len(papers)
                     
                 except Exception as e:
                     error_msg = str(e)[:500]
-                    logger.error(f"❌ Failed to process {paper.title[:30]}: {error_msg}")
+                    logger.error(f"❌ Failed to process batch of {len(papers)} papers: {error_msg}")
                     
-                    paper.processing_error = error_msg
-                    paper.updated_at = datetime.utcnow()
+                    # Only mark papers the pipeline neither finished nor failed with its own error
+                    await db.execute(
+                        update(Paper).where(
+                            and_(
+                                Paper.id.in_([paper.id for paper in papers]),
+                                Paper.is_processed == False,
+                                or_(Paper.processing_error.is_(None), Paper.processing_error == "")
+                            )
+                        ).values(
+                            processing_error=error_msg,
+                            updated_at=datetime.utcnow()
+                        ).execution_options(synchronize_session=False)
+                    )
                     await db.commit()
                     
-                    return 1  # Still counts as processed (with error)
+                    return len(papers)  # Still counts as processed (with error)
                     
             except Exception as e:
                 logger.error(f"Database error in batch processing: {e}")
@@ -1,9 +1,12 @@
 """Citation engine for generating contextual paper suggestions."""
 import numpy as np
+import hashlib
+import msgpack
+import orjson
 from typing import List, Optional, Dict, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.services.embedding import EmbeddingService
+from app.services.embedding import get_embedding_service
 from app.services.vector_search_v2 import VectorSearchService, SearchOptions, SearchResult
 from app.services.text_analysis import TextContext
 from app.core.config import settings
@@ -14,8 +17,25 @@ import redis.asyncio as redis
 
 logger = logging.getLogger(__name__)
 
+# Every user's suggestions search all processed papers, so cached entries are tracked in one
+# set and dropped together whenever the corpus changes
+_CACHE_INDEX_KEY = "citations:keys"
 
-@dataclass
+
+async def invalidate_suggestion_cache():
+    """Drop all cached suggestions, e.g. after papers are processed, edited or deleted."""
+    try:
+        client = redis.from_url(settings.redis_url)
+        try:
+            keys = await client.smembers(_CACHE_INDEX_KEY)
+            await client.delete(_CACHE_INDEX_KEY, *keys)
+        finally:
+            await client.aclose()
+    except Exception as e:
+        logger.warning(f"Cache invalidation failed: {e}")
+
+
+@dataclass(slots=True)
 class Citation:
     """Represents a citation suggestion."""
     paper_id: str
@@ -36,42 +56,58 @@ class Citation:
 class RankingService:
     """Service for ranking and scoring citation suggestions."""
     
+    # Weights for similarity, context, quality and recency (40/25/15/10%)
+    SCORE_WEIGHTS = np.array([0.4, 0.25, 0.15, 0.1])
+    # User preference score (10% weight) - placeholder for now
+    PREFERENCE_SCORE = 0.5 * 0.1
+    # Results at or below this relevance are filtered out as very low confidence
+    MIN_RELEVANCE = 0.5
+    
     def calculate_relevance(self, search_result: SearchResult, context: TextContext) -> float:
         """Calculate overall relevance score for a citation."""
-        # Base similarity from vector search (40% weight)
-        similarity_score = search_result.similarity * 0.4
-        
-        # Contextual relevance (25% weight)
-        context_score = self._calculate_context_score(search_result, context) * 0.25
-        
-        # Paper quality metrics (15% weight)
-        quality_score = self._calculate_quality_score(search_result) * 0.15
+        return float(self._combine_scores(self._score_components([search_result], context))[0])
         
-        # Recency bias (10% weight)
-        recency_score = self._calculate_recency_score(search_result.year) * 0.1
+    def _score_components(self, results: List[SearchResult], context: TextContext) -> np.ndarray:
+        """Score all results at once as an (n, 4) array of similarity/context/quality/recency."""
+        # Context word sets are shared by every result, so build them once
+        prev_words = set(context.previous_sentence.lower().split()) if context.previous_sentence else None
+        para_words = set(context.paragraph.lower().split()) if context.paragraph else None
         
-        # User preference score (10% weight) - placeholder for now
-        preference_score = 0.5 * 0.1
+        components = np.empty((len(results), 4))
+        components[:, 0] = [r.similarity for r in results]
+        components[:, 1] = [self._context_overlap_score(r, prev_words, para_words) for r in results]
+        components[:, 2] = self._quality_scores(results)
+        components[:, 3] = self._recency_scores(np.array([r.year for r in results]))
+        return components
         
-        total_score = similarity_score + context_score + quality_score + recency_score + preference_score
-        
-        return min(max(total_score, 0.0), 1.0)  # Clamp between 0 and 1
+    def _combine_scores(self, components: np.ndarray) -> np.ndarray:
+        """Blend score components into relevance, clamped between 0 and 1."""
+        return np.clip(components @ self.SCORE_WEIGHTS + self.PREFERENCE_SCORE, 0.0, 1.0)
         
     def _calculate_context_score(self, result: SearchResult, context: TextContext) -> float:
         """Calculate how well the result fits the surrounding context."""
+        prev_words = set(context.previous_sentence.lower().split()) if context.previous_sentence else None
+        para_words = set(context.paragraph.lower().split()) if context.paragraph else None
+        return self._context_overlap_score(result, prev_words, para_words)
+        
+    def _context_overlap_score(
+        self,
+        result: SearchResult,
+        prev_words: Optional[set],
+        para_words: Optional[set]
+    ) -> float:
+        """Score keyword overlap between the result and pre-split context words."""
         score = 0.5  # Base score
         
         # Check if previous/next sentences mention similar concepts
-        if context.previous_sentence:
+        if prev_words:
             # Simple keyword matching for now
-            prev_words = set(context.previous_sentence.lower().split())
             title_words = set(result.title.lower().split())
             overlap = len(prev_words & title_words)
             score += min(overlap * 0.1, 0.3)
             
         # Check paragraph relevance
-        if context.paragraph:
-            para_words = set(context.paragraph.lower().split())
+        if para_words:
             abstract_words = set(result.abstract.lower().split()[:50])  # First 50 words
             overlap = len(para_words & abstract_words)
             score += min(overlap * 0.02, 0.2)
@@ -80,60 +116,72 @@ class RankingService:
         
     def _calculate_quality_score(self, result: SearchResult) -> float:
         """Calculate paper quality score based on metadata."""
-        score = 0.5  # Base score
+        return float(self._quality_scores([result])[0])
         
-        # Check if paper has complete metadata
-        if result.metadata:
-            if result.metadata.get("citation_count", 0) > 100:
-                score += 0.3
-            elif result.metadata.get("citation_count", 0) > 10:
-                score += 0.2
-                
-            if result.metadata.get("venue_rank", "C") in ["A", "A+"]:
-                score += 0.2
-            elif result.metadata.get("venue_rank", "C") == "B":
-                score += 0.1
-                
-        return min(score, 1.0)
+    def _quality_scores(self, results: List[SearchResult]) -> np.ndarray:
+        """Vectorized quality scores from citation counts and venue ranks."""
+        # Pull the two metadata fields into columns; results without metadata keep the base score
+        citation_counts = np.array([(r.metadata.get("citation_count") or 0) if r.metadata else 0 for r in results])
+        venue_ranks = np.array([r.metadata.get("venue_rank", "C") if r.metadata else "C" for r in results])
+        
+        citation_bonus = np.select([citation_counts > 100, citation_counts > 10], [0.3, 0.2], 0.0)
+        venue_bonus = np.select([np.isin(venue_ranks, ["A", "A+"]), venue_ranks == "B"], [0.2, 0.1], 0.0)
+        return np.minimum(0.5 + citation_bonus + venue_bonus, 1.0)
         
     def _calculate_recency_score(self, year: int) -> float:
         """Calculate recency score with bias towards recent papers."""
-        current_year = datetime.now().year
-        age = current_year - year
+        return float(self._recency_scores(np.array([year]))[0])
         
-        if age <= 2:
-            return 1.0
-        elif age <= 5:
-            return 0.8
-        elif age <= 10:
-            return 0.6
-        else:
-            return max(0.3, 1.0 - (age * 0.02))  # Decrease by 2% per year, min 0.3
+    def _recency_scores(self, years: np.ndarray) -> np.ndarray:
+        """Vectorized recency scores with bias towards recent papers."""
+        age = datetime.now().year - years
+        return np.select(
+            [age <= 2, age <= 5, age <= 10],
+            [1.0, 0.8, 0.6],
+            np.maximum(0.3, 1.0 - age * 0.02)  # Decrease by 2% per year, min 0.3
+        )
             
-    def rank_results(self, results: List[SearchResult], context: TextContext, max_chunks_per_paper: int = 2) -> List[Citation]:
-        """Rank search results and convert to citations."""
+    def rank_results(
+        self,
+        results: List[SearchResult],
+        context: TextContext,
+        max_chunks_per_paper: int = 2,
+        limit: Optional[int] = None
+    ) -> List[Citation]:
+        """Rank search results and convert the best `limit` of them to citations."""
         citations = []
         paper_chunk_counts = {}  # Track how many chunks we've included per paper
         
-        # First, sort results by similarity to process best matches first
-        results.sort(key=lambda x: x.similarity, reverse=True)
+        # Score every candidate in one vectorized pass
+        components = self._score_components(results, context)
+        relevances = self._combine_scores(components)
         
-        for result in results:
+        # Drop very low confidence results on the score array, before building any objects
+        eligible = np.flatnonzero(relevances > self.MIN_RELEVANCE)
+        
+        # Within a paper relevance follows similarity, so walking candidates by relevance
+        # keeps each paper's best-matching chunks under the per-paper cap
+        head_size = len(eligible) if limit is None else limit * max_chunks_per_paper
+        for j in self._ranked_indices(relevances[eligible], head_size):
+            if limit is not None and len(citations) >= limit:
+                break
+                
+            i = eligible[j]
+            result = results[i]
+            
             # Check if we've already included enough chunks from this paper
             if paper_chunk_counts.get(result.paper_id, 0) >= max_chunks_per_paper:
                 continue
                 
-            relevance = self.calculate_relevance(result, context)
+            relevance = float(relevances[i])
             
             # Determine confidence level
             if relevance > 0.85:
                 confidence = "high"
             elif relevance > 0.70:
                 confidence = "medium"
-            elif relevance > 0.50:
-                confidence = "low"
             else:
-                continue  # Filter out very low confidence
+                confidence = "low"
                 
             # Generate display text
             display_text = self._generate_display_text(result)
@@ -148,9 +196,9 @@ class RankingService:
                 display_text=display_text,
                 relevance_scores={
                     "similarity": result.similarity,
-                    "context": self._calculate_context_score(result, context),
-                    "quality": self._calculate_quality_score(result),
-                    "recency": self._calculate_recency_score(result.year)
+                    "context": float(components[i, 1]),
+                    "quality": float(components[i, 2]),
+                    "recency": float(components[i, 3])
                 },
                 chunk_text=result.chunk_text,
                 chunk_index=result.chunk_index,
@@ -162,11 +210,22 @@ class RankingService:
             # Update chunk count for this paper
             paper_chunk_counts[result.paper_id] = paper_chunk_counts.get(result.paper_id, 0) + 1
             
-        # Sort by confidence
-        citations.sort(key=lambda x: x.confidence, reverse=True)
-        
         return citations
         
+    @staticmethod
+    def _ranked_indices(scores: np.ndarray, head_size: int):
+        """Yield indices by descending score, fully sorting only the first head_size."""
+        if head_size < len(scores):
+            partitioned = np.argpartition(-scores, head_size)
+            head, tail = partitioned[:head_size], partitioned[head_size:]
+        else:
+            head, tail = np.arange(len(scores)), None
+            
+        yield from head[np.argsort(-scores[head], kind="stable")]
+        if tail is not None:
+            # Only reached when the per-paper cap skipped candidates in the head
+            yield from tail[np.argsort(-scores[tail], kind="stable")]
+        
     def _generate_display_text(self, result: SearchResult) -> str:
         """Generate the display text for inline citation."""
         # Simple format: (First Author et al., Year)
@@ -183,10 +242,15 @@ class RankingService:
 class CitationEngine:
     """Main engine for generating citation suggestions."""
     
+    CACHE_TTL = 3600  # 1 hour
+    
+    # In-flight suggestion computations shared by concurrent identical requests
+    _inflight: Dict[str, asyncio.Future] = {}
+    
     def __init__(self, db: AsyncSession):
         """Initialize the citation engine."""
         self.db = db
-        self.embedding_service = EmbeddingService()
+        self.embedding_service = get_embedding_service()
         self.vector_search = VectorSearchService(db)
         self.ranking_service = RankingService()
         
@@ -199,8 +263,7 @@ class CitationEngine:
         try:
             self.redis_client = redis.from_url(
                 settings.redis_url,
-                encoding="utf-8",
-                decode_responses=True
+                decode_responses=False  # Cached payloads are msgpack bytes
             )
         except Exception as e:
             logger.warning(f"Redis not available for caching: {e}")
@@ -219,49 +282,88 @@ class CitationEngine:
         if options is None:
             options = SearchOptions(limit=30, min_similarity=0.4)  # Get more results, filter later
             
-        # Check cache first
-        cache_key = f"citations:{user_id}:{hash(text)}"
-        if self.redis_client:
-            try:
-                cached = await self.redis_client.get(cache_key)
-                if cached:
-                    logger.info("Returning cached citation suggestions")
-                    # TODO: Deserialize cached citations
-                    pass
-            except Exception as e:
-                logger.warning(f"Cache retrieval failed: {e}")
-                
-        # Generate embedding for the text
+        # Concurrent identical requests share one computation
+        cache_key = self._cache_key(user_id, text, context, options)
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._compute_suggestions(text, context, user_id, options, cache_key)
+            )
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+            
+        # Shield so one caller going away doesn't cancel the work for the others
+        return await asyncio.shield(task)
+        
+    async def _compute_suggestions(
+        self,
+        text: str,
+        context: TextContext,
+        user_id: str,
+        options: SearchOptions,
+        cache_key: str
+    ) -> List[Citation]:
+        """Serve suggestions from the cache or run the search and ranking pipeline."""
+        # Check the cache first so hits never occupy the embedding executor
+        cached = await self._get_cached_citations(cache_key)
+        if cached is not None:
+            logger.info("Returning cached citation suggestions")
+            return cached
+            
         embedding = await self.embedding_service.generate_embedding(text)
         
-        # Search for similar papers
+        # Search for similar papers on the session of the caller that started the computation
         search_results = await self.vector_search.search_similar_chunks(
             embedding=embedding,
             user_id=user_id,
             options=options
         )
         
-        # Rank and filter results
-        citations = self.ranking_service.rank_results(search_results, context)
-        
-        # Limit to top results
-        citations = citations[:10]
+        # Rank and filter results, building citations only for the top 10
+        citations = self.ranking_service.rank_results(search_results, context, limit=10)
         
         # Cache the results
         if self.redis_client and citations:
             try:
-                # TODO: Serialize citations for caching
-                await self.redis_client.setex(
-                    cache_key,
-                    3600,  # 1 hour TTL
-                    "cached_data"  # Placeholder
-                )
+                payload = msgpack.packb([asdict(c) for c in citations], use_bin_type=True)
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.setex(cache_key, self.CACHE_TTL, payload)
+                    pipe.sadd(_CACHE_INDEX_KEY, cache_key)
+                    pipe.expire(_CACHE_INDEX_KEY, self.CACHE_TTL)
+                    await pipe.execute()
             except Exception as e:
                 logger.warning(f"Cache storage failed: {e}")
                 
         logger.info(f"Generated {len(citations)} citation suggestions for user {user_id}")
         return citations
         
+    async def _get_cached_citations(self, cache_key: str) -> Optional[List[Citation]]:
+        """Return cached citations for a key, or None on a miss."""
+        if not self.redis_client:
+            return None
+        try:
+            cached = await self.redis_client.get(cache_key)
+            if cached:
+                return [Citation(**data) for data in msgpack.unpackb(cached, raw=False)]
+        except Exception as e:
+            logger.warning(f"Cache retrieval failed: {e}")
+        return None
+        
+    @staticmethod
+    def _cache_key(user_id: str, text: str, context: TextContext, options: SearchOptions) -> str:
+        """Build a cache key that is stable across processes (unlike hash()).
+        
+        Covers everything the result depends on: the ranking reads the previous sentence
+        and paragraph, and the options shape the vector search.
+        """
+        request = orjson.dumps(
+            [text, context.previous_sentence, context.paragraph,
+             options.limit, options.min_similarity, options.filters],
+            option=orjson.OPT_SORT_KEYS
+        )
+        digest = hashlib.blake2b(request, digest_size=16).hexdigest()
+        return f"citations:{user_id}:{digest}"
+        
     async def batch_get_suggestions(
         self,
         texts: List[str],
@@ -287,12 +389,12 @@ class CitationEngine:
         # Rank results for each context
         all_citations = []
         for results, context in zip(all_results, contexts):
-            citations = self.ranking_service.rank_results(results, context)
-            all_citations.append(citations[:5])  # Top 5 per text
+            citations = self.ranking_service.rank_results(results, context, limit=5)
+            all_citations.append(citations)  # Top 5 per text
             
         return all_citations
         
     async def close(self):
         """Clean up resources."""
         if self.redis_client:
-            await self.redis_client.close()
\ No newline at end of file
+            await self.redis_client.aclose()
\ No newline at end of file
@@ -1,18 +1,81 @@
 """Document service for business logic."""
-from typing import Optional, List
+from typing import Optional, List, Set
 from datetime import datetime
+import asyncio
+import logging
 import uuid
 import secrets
-import json
+import orjson
+from collections import deque
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_, or_, delete, update
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.db.session import AsyncSessionLocal
+from app.models.citation import Citation
 from app.models.document import Document
 from app.models.user import User
 from app.schemas.document import DocumentCreate, DocumentUpdate
 
+logger = logging.getLogger(__name__)
+
+
+class DocumentAccessTracker:
+    """Coalesces last_accessed_at updates into one UPDATE per flush interval."""
+    
+    def __init__(self, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self._pending: Set[uuid.UUID] = set()
+        self._task: Optional[asyncio.Task] = None
+    
+    def record(self, document_id: uuid.UUID):
+        """Mark a document as accessed; written on the next flush."""
+        self._pending.add(document_id)
+    
+    async def start(self):
+        """Start the periodic flush task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+    
+    async def stop(self):
+        """Stop the flush task and write any remaining accesses."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    async def flush(self):
+        """Write all pending access timestamps in a single statement."""
+        if not self._pending:
+            return
+        
+        document_ids, self._pending = list(self._pending), set()
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(Document)
+                    .where(Document.id.in_(document_ids))
+                    .values(last_accessed_at=datetime.utcnow())
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to update last_accessed_at for {len(document_ids)} documents: {e}")
+
+
+# Global instance
+document_access_tracker = DocumentAccessTracker()
+
 
 class DocumentService:
     """Service for document operations."""
@@ -30,8 +93,7 @@ class DocumentService:
         
         if document_data.content:
             # Simple extraction of text from Lexical format
-            plain_text = DocumentService._extract_plain_text(document_data.content)
-            word_count = len(plain_text.split())
+            plain_text, word_count = DocumentService._extract_text_and_word_count(document_data.content)
         
         # Create document
         document = Document(
@@ -72,13 +134,18 @@ class DocumentService:
         result = await db.execute(query.options(selectinload(Document.owner)))
         document = result.scalar_one_or_none()
         
-        # Update last accessed timestamp
+        # Update last accessed timestamp (written in batches by the tracker)
         if document:
-            document.last_accessed_at = datetime.utcnow()
-            await db.commit()
+            DocumentService.mark_accessed(document)
         
         return document
     
+    @staticmethod
+    def mark_accessed(document: Document):
+        """Queue a last_accessed_at update and reflect it on the loaded instance."""
+        document_access_tracker.record(document.id)
+        set_committed_value(document, "last_accessed_at", datetime.utcnow())
+    
     @staticmethod
     async def get_documents(
         db: AsyncSession,
@@ -89,41 +156,43 @@ class DocumentService:
         is_public_only: bool = False
     ) -> tuple[List[Document], int]:
         """Get documents with pagination."""
-        # Base query
-        query = select(Document)
-        count_query = select(func.count(Document.id))
-        
         # Filter by ownership or public access
         if user_id and not is_public_only:
             filter_condition = (Document.owner_id == user_id) | (Document.is_public == True)
         else:
             filter_condition = Document.is_public == True
         
-        query = query.where(filter_condition)
-        count_query = count_query.where(filter_condition)
-        
-        # Search filter
+        # Search filter (served by the trigram indexes on title/description)
         if search:
             search_filter = (
                 Document.title.ilike(f"%{search}%") |
                 Document.description.ilike(f"%{search}%")
             )
-            query = query.where(search_filter)
-            count_query = count_query.where(search_filter)
+            filter_condition = and_(filter_condition, search_filter)
+        
+        # Fetch the page and the total in one round trip via COUNT(*) OVER ()
+        query = (
+            select(Document, func.count().over().label("total"))
+            .where(filter_condition)
+            .order_by(Document.updated_at.desc())
+            .offset(skip)
+            .limit(limit)
+            .options(selectinload(Document.owner))
+        )
         
-        # Get total count
-        total_result = await db.execute(count_query)
-        total = total_result.scalar() or 0
+        result = await db.execute(query)
+        rows = result.all()
         
-        # Get paginated results
-        query = query.order_by(Document.updated_at.desc())
-        query = query.offset(skip).limit(limit)
-        query = query.options(selectinload(Document.owner))
+        if rows:
+            return [row[0] for row in rows], rows[0].total
         
-        result = await db.execute(query)
-        documents = result.scalars().all()
+        # Page past the end - the window count isn't available, so count separately
+        total = 0
+        if skip > 0:
+            total_result = await db.execute(select(func.count(Document.id)).where(filter_condition))
+            total = total_result.scalar() or 0
         
-        return documents, total
+        return [], total
     
     @staticmethod
     async def update_document(
@@ -151,8 +220,9 @@ class DocumentService:
         
         # Update plain text and word count if content changed
         if "content" in update_data and update_data["content"]:
-            document.plain_text = DocumentService._extract_plain_text(update_data["content"])
-            document.word_count = len(document.plain_text.split())
+            document.plain_text, document.word_count = DocumentService._extract_text_and_word_count(
+                update_data["content"]
+            )
         
         # Generate share token if making public
         if "is_public" in update_data:
@@ -197,43 +267,53 @@ class DocumentService:
         user_id: uuid.UUID
     ) -> int:
         """Delete multiple documents at once."""
-        # Get all documents that belong to the user
-        query = select(Document).where(
-            and_(
-                Document.id.in_(document_ids),
-                Document.owner_id == user_id
-            )
+        owned = and_(
+            Document.id.in_(document_ids),
+            Document.owner_id == user_id
         )
-        result = await db.execute(query)
-        documents = result.scalars().all()
-        
-        deleted_count = 0
-        for document in documents:
-            await db.delete(document)
-            deleted_count += 1
         
+        # Citations have no ON DELETE CASCADE, so remove them first in the same transaction
+        await db.execute(
+            delete(Citation).where(Citation.document_id.in_(select(Document.id).where(owned)))
+        )
+        result = await db.execute(delete(Document).where(owned))
         await db.commit()
         
-        return deleted_count
+        return result.rowcount
     
     @staticmethod
     def _extract_plain_text(content: dict) -> str:
         """Extract plain text from Lexical editor content."""
+        return " ".join(DocumentService._extract_text_parts(content))
+    
+    @staticmethod
+    def _extract_text_and_word_count(content: dict) -> tuple[str, int]:
+        """Extract plain text and its word count in one pass over the text nodes."""
+        text_parts = DocumentService._extract_text_parts(content)
+        word_count = sum(len(part.split()) for part in text_parts)
+        return " ".join(text_parts), word_count
+    
+    @staticmethod
+    def _extract_text_parts(content) -> List[str]:
+        """Collect text node contents from a Lexical tree in document order."""
         # This is a simplified extraction - in production, you'd parse the Lexical format properly
+        if isinstance(content, (str, bytes)):
+            content = orjson.loads(content)
+        
         text_parts = []
+        if "root" not in content:
+            return text_parts
         
-        def extract_text(node):
+        # Iterative walk so deeply nested documents can't hit the recursion limit
+        stack = deque([content["root"]])
+        while stack:
+            node = stack.pop()
             if isinstance(node, dict):
                 if node.get("type") == "text" and "text" in node:
                     text_parts.append(node["text"])
                 elif "children" in node:
-                    for child in node["children"]:
-                        extract_text(child)
+                    stack.extend(reversed(node["children"]))
             elif isinstance(node, list):
-                for item in node:
-                    extract_text(item)
-        
-        if "root" in content:
-            extract_text(content["root"])
+                stack.extend(reversed(node))
         
-        return " ".join(text_parts)
\ No newline at end of file
+        return text_parts
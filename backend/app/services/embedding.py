@@ -1,14 +1,23 @@
 """Embedding service for generating text embeddings using sentence-transformers."""
+import os
 import numpy as np
 from typing import List, Optional, Dict
 from sentence_transformers import SentenceTransformer
-import hashlib
 import json
+import xxhash
+from collections import OrderedDict
 from functools import lru_cache
 import logging
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+from app.core.config import settings
+
+try:
+    import onnxruntime as ort
+except ImportError:  # ONNX Runtime is optional; fall back to sentence-transformers
+    ort = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,16 +28,25 @@ class EmbeddingService:
         """Initialize the embedding service with specified model."""
         self.model_name = model_name
         self.model = None
+        self._ort_session = None
+        self._tokenizer = None
         self._load_model()
         
         # Thread pool for CPU-bound embedding generation
         self.executor = ThreadPoolExecutor(max_workers=4)
         
-        # In-memory cache for embeddings (LRU with 1000 entries)
+        # In-memory LRU cache of embeddings keyed by text hash, so duplicate chunks are embedded once
         self._cache_size = 1000
+        self._cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        
+        # In-flight embedding tasks shared by concurrent requests for the same text
+        self._inflight: Dict[int, asyncio.Future] = {}
         
     def _load_model(self):
         """Load the sentence transformer model."""
+        if self._load_onnx_model():
+            return
+            
         try:
             logger.info(f"Loading embedding model: {self.model_name}")
             self.model = SentenceTransformer(self.model_name)
@@ -38,23 +56,102 @@ class EmbeddingService:
             logger.error(f"Failed to load embedding model: {e}")
             raise
             
-    def _text_to_hash(self, text: str) -> str:
-        """Generate a hash for the text to use as cache key."""
-        return hashlib.md5(text.encode()).hexdigest()
+    def _load_onnx_model(self) -> bool:
+        """Load the INT8-quantized ONNX export of the model if one is configured."""
+        onnx_dir = settings.embedding_onnx_dir
+        if not onnx_dir or ort is None:
+            return False
+            
+        model_path = os.path.join(onnx_dir, "model.onnx")
+        if not os.path.exists(model_path):
+            logger.warning(f"ONNX model not found at {model_path}, using sentence-transformers")
+            return False
+            
+        try:
+            from transformers import AutoTokenizer
+            
+            sess_options = ort.SessionOptions()
+            sess_options.intra_op_num_threads = settings.embedding_onnx_threads
+            self._ort_session = ort.InferenceSession(
+                model_path,
+                sess_options,
+                providers=["CPUExecutionProvider"]
+            )
+            self._ort_input_names = [i.name for i in self._ort_session.get_inputs()]
+            self._tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+            self.embedding_dim = self._encode_onnx(["dimension probe"], batch_size=1).shape[1]
+            logger.info(f"Loaded ONNX embedding model from {model_path}. Embedding dimension: {self.embedding_dim}")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to load ONNX embedding model, using sentence-transformers: {e}")
+            self._ort_session = None
+            self._tokenizer = None
+            return False
+            
+    def _encode_onnx(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Encode texts with ONNX Runtime using mean pooling and L2 normalization."""
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+            
+        # Tokenize once without padding, then batch by length so each batch pads minimally
+        encoded = self._tokenizer(texts, truncation=True, max_length=256)
+        order = np.argsort([len(ids) for ids in encoded["input_ids"]], kind="stable")
+        
+        embeddings = None
+        for start in range(0, len(texts), batch_size):
+            batch_idx = order[start:start + batch_size]
+            features = self._tokenizer.pad(
+                {name: [encoded[name][i] for i in batch_idx] for name in encoded.keys()},
+                padding="longest",
+                return_tensors="np"
+            )
+            inputs = {
+                name: features[name].astype(np.int64)
+                for name in self._ort_input_names
+                if name in features
+            }
+            token_embeddings = self._ort_session.run(None, inputs)[0]
+            
+            # Mean pooling over non-padding tokens, then L2 normalize
+            mask = features["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            
+            if embeddings is None:
+                embeddings = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            embeddings[batch_idx] = pooled  # Scatter back into input order
+            
+        return embeddings
+            
+    def _text_to_hash(self, text: str) -> int:
+        """Generate a non-cryptographic hash for the text to use as cache key."""
+        return xxhash.xxh3_64_intdigest(text.encode())
         
-    @lru_cache(maxsize=1000)
-    def _get_cached_embedding(self, text_hash: str) -> Optional[np.ndarray]:
-        """Get embedding from cache if available."""
-        return None  # LRU cache will handle this
+    def _get_cached_embedding(self, text_hash: int) -> Optional[np.ndarray]:
+        """Get embedding from cache if available, marking it recently used."""
+        embedding = self._cache.get(text_hash)
+        if embedding is not None:
+            self._cache.move_to_end(text_hash)
+        return embedding
+        
+    def _cache_embedding(self, text_hash: int, embedding: np.ndarray):
+        """Cache an embedding, evicting the least recently used entry when full."""
+        self._cache[text_hash] = embedding
+        self._cache.move_to_end(text_hash)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
         
     def _generate_embedding_sync(self, text: str) -> np.ndarray:
         """Synchronously generate embedding for a single text."""
+        if self._ort_session is not None:
+            return self._encode_onnx([text], batch_size=1)[0]
+            
         if not self.model:
             raise RuntimeError("Embedding model not loaded")
             
-        # Generate embedding
+        # Generate embedding (already float32, so astype doesn't copy)
         embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.astype(np.float32)
+        return embedding.astype(np.float32, copy=False)
         
     async def generate_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for a single text asynchronously."""
@@ -66,66 +163,74 @@ class EmbeddingService:
         if cached is not None:
             return cached
             
-        # Generate embedding in thread pool
-        loop = asyncio.get_event_loop()
-        embedding = await loop.run_in_executor(
-            self.executor, 
-            self._generate_embedding_sync, 
-            text
-        )
+        # Generate embedding in thread pool, sharing one forward pass between concurrent callers
+        task = self._inflight.get(text_hash)
+        if task is None:
+            loop = asyncio.get_event_loop()
+            task = asyncio.ensure_future(loop.run_in_executor(
+                self.executor,
+                self._generate_embedding_sync,
+                text
+            ))
+            self._inflight[text_hash] = task
+            task.add_done_callback(lambda _: self._inflight.pop(text_hash, None))
+            
+        embedding = await asyncio.shield(task)
         
         # Cache the result
-        self._get_cached_embedding.cache_clear()  # Clear if cache is full
-        self._get_cached_embedding(text_hash)  # This will cache it
+        self._cache_embedding(text_hash, embedding)
         
         return embedding
         
-    def _generate_batch_embeddings_sync(self, texts: List[str]) -> List[np.ndarray]:
+    def _generate_batch_embeddings_sync(self, texts: List[str], batch_size: int = 32) -> List[np.ndarray]:
         """Synchronously generate embeddings for multiple texts."""
+        if self._ort_session is not None:
+            return list(self._encode_onnx(texts, batch_size=batch_size))
+            
         if not self.model:
             raise RuntimeError("Embedding model not loaded")
             
         # Generate embeddings in batch
-        embeddings = self.model.encode(texts, convert_to_numpy=True, batch_size=32)
-        return [emb.astype(np.float32) for emb in embeddings]
+        embeddings = self.model.encode(texts, convert_to_numpy=True, batch_size=batch_size)
         
-    async def generate_batch_embeddings(self, texts: List[str]) -> List[np.ndarray]:
-        """Generate embeddings for multiple texts asynchronously."""
+        # Rows of the float32 batch array are views - no per-embedding copies
+        return list(embeddings.astype(np.float32, copy=False))
+        
+    async def generate_batch_embeddings(self, texts: List[str], batch_size: int = 32) -> List[np.ndarray]:
+        """Generate embeddings for multiple texts asynchronously, batch_size texts per forward pass."""
         if not texts:
             return []
             
-        # Separate cached and uncached texts
-        uncached_texts = []
-        uncached_indices = []
-        results = [None] * len(texts)
+        # Separate cached and uncached texts; repeated texts are embedded once
+        hashes = [self._text_to_hash(text) for text in texts]
+        embeddings = {}
+        uncached = {}
         
-        for i, text in enumerate(texts):
-            text_hash = self._text_to_hash(text)
+        for text_hash, text in zip(hashes, texts):
+            if text_hash in embeddings or text_hash in uncached:
+                continue
             cached = self._get_cached_embedding(text_hash)
-            
             if cached is not None:
-                results[i] = cached
+                embeddings[text_hash] = cached
             else:
-                uncached_texts.append(text)
-                uncached_indices.append(i)
+                uncached[text_hash] = text
                 
         # Generate embeddings for uncached texts
-        if uncached_texts:
+        if uncached:
             loop = asyncio.get_event_loop()
             new_embeddings = await loop.run_in_executor(
                 self.executor,
                 self._generate_batch_embeddings_sync,
-                uncached_texts
+                list(uncached.values()),
+                batch_size
             )
             
-            # Place new embeddings in results and cache them
-            for idx, embedding, text in zip(uncached_indices, new_embeddings, uncached_texts):
-                results[idx] = embedding
-                # Cache the embedding
-                text_hash = self._text_to_hash(text)
-                self._get_cached_embedding(text_hash)  # This will cache it
+            # Cache the new embeddings
+            for text_hash, embedding in zip(uncached, new_embeddings):
+                embeddings[text_hash] = embedding
+                self._cache_embedding(text_hash, embedding)
                 
-        return results
+        return [embeddings[text_hash] for text_hash in hashes]
         
     def get_cached_embedding(self, text: str) -> Optional[np.ndarray]:
         """Get embedding from cache if available (sync method)."""
@@ -137,25 +242,38 @@ class EmbeddingService:
         logger.info(f"Precomputing embeddings for {len(common_texts)} common texts")
         
         embeddings = {}
-        for text in common_texts:
+        batch_size = 256
+        for start in range(0, len(common_texts), batch_size):
+            batch = common_texts[start:start + batch_size]
             try:
-                embedding = self._generate_embedding_sync(text)
+                # One batched forward pass per slice instead of one per text
+                batch_embeddings = self._generate_batch_embeddings_sync(batch)
+            except Exception as e:
+                logger.error(f"Failed to generate embeddings for texts {start}-{start + len(batch)}: {e}")
+                continue
+                
+            for text, embedding in zip(batch, batch_embeddings):
                 embeddings[text] = embedding
                 # Also cache it
-                text_hash = self._text_to_hash(text)
-                self._get_cached_embedding(text_hash)
-            except Exception as e:
-                logger.error(f"Failed to generate embedding for '{text}': {e}")
+                self._cache_embedding(self._text_to_hash(text), embedding)
+                
+            logger.info(f"Precomputed {min(start + batch_size, len(common_texts))}/{len(common_texts)} embeddings")
                 
         logger.info(f"Precomputed {len(embeddings)} embeddings successfully")
         return embeddings
         
     def clear_cache(self):
         """Clear the embedding cache."""
-        self._get_cached_embedding.cache_clear()
+        self._cache.clear()
         logger.info("Embedding cache cleared")
         
     def __del__(self):
         """Cleanup resources."""
         if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=False)
\ No newline at end of file
+            self.executor.shutdown(wait=False)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    """Return the process-wide embedding service so the model is loaded only once."""
+    return EmbeddingService()
@@ -1,17 +1,76 @@
 """Export services for documents and papers."""
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
+from collections import OrderedDict
 import uuid
 from datetime import datetime
 import re
+from functools import lru_cache
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, exists, func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import joinedload, load_only, raiseload
 
+from app.db.session import AsyncSessionLocal
 from app.models.document import Document
 from app.models.document_paper import DocumentPaper
 from app.models.paper import Paper
 
+_NON_ALPHA_RE = re.compile(r'[^a-zA-Z]')
+_STOPWORD_SET = frozenset({'a', 'an', 'the', 'of', 'in', 'on', 'at', 'to', 'for'})
+
+# LaTeX special characters
+_LATEX_ESCAPE_MAP = {
+    '\\': '\\textbackslash{}',
+    '{': '\\{',
+    '}': '\\}',
+    '$': '\\$',
+    '&': '\\&',
+    '#': '\\#',
+    '^': '\\textasciicircum{}',
+    '_': '\\_',
+    '~': '\\textasciitilde{}',
+    '%': '\\%',
+}
+_LATEX_ESCAPE_TABLE = str.maketrans(_LATEX_ESCAPE_MAP)
+# Longer strings (document bodies) are unlikely to repeat and are not cached
+_ESCAPE_CACHE_MAX_LENGTH = 256
+
+# Heading level -> sectioning command (index 0 is unused)
+_SECTION_COMMANDS = ("\\paragraph", "\\section", "\\subsection", "\\subsubsection", "\\paragraph", "\\subparagraph")
+# Citation node fields holding the citation key, in order of preference, then the paper id
+_CITATION_KEY_FIELDS = ("citationKey", "citation_key", "key", "paperId", "paper_id")
+
+# Lexical text format bits and the commands that render them
+_FORMAT_COMMANDS = ((1, "\\textbf"), (2, "\\textit"), (8, "\\underline"), (16, "\\texttt"))
+
+# How a Lexical node is rendered: as a block, inline, as a list item or inside a list item
+_BLOCK, _INLINE, _ITEM, _ITEM_CHILD = range(4)
+
+
+def _alpha_only(word: str) -> str:
+    """Strip non-ASCII-letters, skipping the regex for words that are already plain letters."""
+    return word if word.isascii() and word.isalpha() else _NON_ALPHA_RE.sub('', word)
+
+
+@lru_cache(maxsize=4096)
+def _escape_latex_cached(text: str) -> str:
+    return text.translate(_LATEX_ESCAPE_TABLE)
+
+
+# Paper columns read by _generate_bibtex_entry; embeddings and full text are never needed
+_BIBTEX_PAPER_COLUMNS = (
+    Paper.title, Paper.authors, Paper.year, Paper.journal, Paper.doi,
+    Paper.arxiv_id, Paper.pubmed_id, Paper.source_url, Paper.abstract,
+)
+
+# Generated BibTeX entries per (document, paper assignment fingerprint), least recently used first
+_BIBTEX_CACHE_SIZE = 128
+_bibtex_cache: "OrderedDict[tuple, List[str]]" = OrderedDict()
+# Bibliographies with more papers than this are streamed from the database in batches
+_BIBTEX_STREAM_THRESHOLD = 500
+_BIBTEX_STREAM_BATCH_SIZE = 500
+
 
 class ExportService:
     """Service for exporting documents and papers to various formats."""
@@ -21,44 +80,127 @@ class ExportService:
         db: AsyncSession,
         document_id: uuid.UUID,
         user_id: uuid.UUID
-    ) -> str:
-        """Export all papers assigned to a document as BibTeX."""
-        # Get document with papers
+    ) -> AsyncIterator[str]:
+        """Export all papers assigned to a document as BibTeX, streamed entry by entry.
+        
+        The document is looked up before streaming starts, so a missing document
+        raises ValueError here rather than midway through a response.
+        """
+        # Get the document title and a fingerprint of its paper assignments in one query.
+        # Notes and positions change without timestamps, so they are hashed in directly.
+        assignments = func.string_agg(
+            func.concat(DocumentPaper.paper_id, ":", DocumentPaper.position, ":", func.coalesce(DocumentPaper.notes, "")),
+            aggregate_order_by(literal_column("','"), DocumentPaper.position, DocumentPaper.paper_id),
+        )
         result = await db.execute(
-            select(Document)
+            select(Document.title, func.count(DocumentPaper.id), func.max(Paper.updated_at), func.md5(assignments))
+            .select_from(Document)
+            .outerjoin(DocumentPaper, DocumentPaper.document_id == Document.id)
+            .outerjoin(Paper, Paper.id == DocumentPaper.paper_id)
             .where(Document.id == document_id, Document.owner_id == user_id)
+            .group_by(Document.id)
         )
-        document = result.scalar_one_or_none()
-        if not document:
+        row = result.one_or_none()
+        if not row:
             raise ValueError("Document not found")
+        title, paper_count, papers_updated_at, assignments_hash = row
         
-        # Get all papers assigned to this document
-        result = await db.execute(
+        cache_key = (document_id, paper_count, papers_updated_at, assignments_hash)
+        entries = _bibtex_cache.get(cache_key)
+        if entries is not None:
+            _bibtex_cache.move_to_end(cache_key)
+            return ExportService._iter_bibtex(title, paper_count, ExportService._iter_items(entries))
+        
+        if not paper_count:
+            return ExportService._iter_bibtex(title, paper_count, ExportService._iter_items([]))
+        
+        # Load the papers (ordered by position); the many-to-one paper is joined in.
+        # Any other relationship access raises rather than lazy loading per paper.
+        stmt = (
             select(DocumentPaper)
-            .options(selectinload(DocumentPaper.paper))
+            .options(
+                joinedload(DocumentPaper.paper).options(
+                    load_only(*_BIBTEX_PAPER_COLUMNS, raiseload=True),
+                    raiseload("*"),
+                ),
+                raiseload("*"),
+            )
             .where(DocumentPaper.document_id == document_id)
-            .order_by(DocumentPaper.position)
+            .order_by(DocumentPaper.position, DocumentPaper.paper_id)
         )
-        doc_papers = result.scalars().all()
         
-        if not doc_papers:
-            return "% No papers assigned to this document\n"
+        if paper_count > _BIBTEX_STREAM_THRESHOLD:
+            # Very large bibliographies are streamed in batches and not cached,
+            # so memory stays bounded by the batch size
+            doc_papers = ExportService._stream_document_papers(stmt)
+            cache_key = None
+        else:
+            result = await db.execute(stmt)
+            doc_papers = ExportService._iter_items(result.scalars().all())
         
-        # Generate BibTeX entries
-        bibtex_entries = [
-            f"% BibTeX export for document: {document.title}\n",
-            f"% Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
-            f"% Total papers: {len(doc_papers)}\n\n"
-        ]
+        return ExportService._iter_bibtex(
+            title, paper_count, ExportService._bibtex_entries(doc_papers, cache_key)
+        )
+    
+    @staticmethod
+    async def _iter_bibtex(title: str, paper_count: int, entries: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Yield the BibTeX header and then the entries."""
+        if not paper_count:
+            yield "% No papers assigned to this document\n"
+            return
+        
+        # The header is never cached so the timestamp stays current
+        yield (
+            f"% BibTeX export for document: {title}\n"
+            f"% Generated on: {datetime.now().isoformat(sep=' ', timespec='seconds')}\n"
+            f"% Total papers: {paper_count}"
+        )
+        
+        async for entry in entries:
+            yield entry
         
-        for doc_paper in doc_papers:
-            paper = doc_paper.paper
-            entry = ExportService._generate_bibtex_entry(paper)
+        yield "\n"
+    
+    @staticmethod
+    async def _bibtex_entries(
+        doc_papers: AsyncIterator[DocumentPaper],
+        cache_key: Optional[tuple]
+    ) -> AsyncIterator[str]:
+        """Yield one entry per paper and cache the entries once all were generated."""
+        entries = []
+        
+        # Entries are separated by exactly one blank line
+        async for doc_paper in doc_papers:
+            entry = ExportService._generate_bibtex_entry(doc_paper.paper)
             if doc_paper.notes:
                 entry = f"% Notes: {doc_paper.notes}\n{entry}"
-            bibtex_entries.append(entry)
-        
-        return "\n".join(bibtex_entries)
+            entry = f"\n\n{entry}"
+            if cache_key is not None:
+                entries.append(entry)
+            yield entry
+        
+        if cache_key is not None:
+            _bibtex_cache[cache_key] = entries
+            if len(_bibtex_cache) > _BIBTEX_CACHE_SIZE:
+                _bibtex_cache.popitem(last=False)
+    
+    @staticmethod
+    async def _stream_document_papers(stmt) -> AsyncIterator[DocumentPaper]:
+        """Stream document papers through a server-side cursor in batches.
+        
+        Uses its own session because streaming runs while the response is being
+        sent, independent of the request's session lifetime.
+        """
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt.execution_options(yield_per=_BIBTEX_STREAM_BATCH_SIZE))
+            async for doc_paper in result.scalars():
+                yield doc_paper
+    
+    @staticmethod
+    async def _iter_items(items: List[Any]) -> AsyncIterator[Any]:
+        """Iterate an in-memory list asynchronously."""
+        for item in items:
+            yield item
     
     @staticmethod
     def _generate_bibtex_entry(paper: Paper) -> str:
@@ -73,56 +215,27 @@ class ExportService:
         elif paper.journal and paper.journal.lower() in ["arxiv", "biorxiv", "medrxiv"]:
             entry_type = "misc"
         
-        # Start building the entry
-        entry_lines = [f"@{entry_type}{{{citation_key},"]
-        
-        # Required fields
-        entry_lines.append(f'  title = {{{paper.title}}},')
-        
-        # Authors
-        if paper.authors:
-            authors_str = " and ".join(paper.authors)
-            entry_lines.append(f'  author = {{{authors_str}}},')
-        
-        # Year
-        if paper.year:
-            entry_lines.append(f'  year = {{{paper.year}}},')
-        
-        # Journal/venue
-        if paper.journal:
-            if entry_type == "article":
-                entry_lines.append(f'  journal = {{{paper.journal}}},')
-            else:
-                entry_lines.append(f'  howpublished = {{{paper.journal}}},')
-        
-        # Identifiers
-        if paper.doi:
-            entry_lines.append(f'  doi = {{{paper.doi}}},')
-        
-        if paper.arxiv_id:
-            entry_lines.append(f'  eprint = {{{paper.arxiv_id}}},')
-            entry_lines.append('  archivePrefix = {arXiv},')
-        
-        if paper.pubmed_id:
-            entry_lines.append(f'  pmid = {{{paper.pubmed_id}}},')
-        
-        # URL
-        if paper.source_url:
-            entry_lines.append(f'  url = {{{paper.source_url}}},')
-        
-        # Abstract
-        if paper.abstract:
+        is_article = entry_type == "article"
+        abstract = paper.abstract
+        if abstract:
             # Clean abstract for BibTeX
-            abstract_clean = paper.abstract.replace('\n', ' ').replace('"', "''")
-            entry_lines.append(f'  abstract = {{{abstract_clean}}},')
-        
-        # Remove trailing comma from last line
-        if entry_lines[-1].endswith(','):
-            entry_lines[-1] = entry_lines[-1][:-1]
-        
-        entry_lines.append("}\n")
+            abstract = abstract.replace('\n', ' ').replace('"', "''")
+        
+        fields = [
+            ("title", paper.title),
+            ("author", " and ".join(paper.authors) if paper.authors else None),
+            ("year", paper.year),
+            ("journal" if is_article else "howpublished", paper.journal),
+            ("doi", paper.doi),
+            ("eprint", paper.arxiv_id),
+            ("archivePrefix", "arXiv" if paper.arxiv_id else None),
+            ("pmid", paper.pubmed_id),
+            ("url", paper.source_url),
+            ("abstract", abstract),
+        ]
+        field_lines = ",\n".join(f"  {name} = {{{value}}}" for name, value in fields if value)
         
-        return "\n".join(entry_lines)
+        return f"@{entry_type}{{{citation_key},\n{field_lines}\n}}"
     
     @staticmethod
     def _generate_citation_key(paper: Paper) -> str:
@@ -136,7 +249,7 @@ class ExportService:
             # Extract last name (simple approach)
             last_name = first_author.split()[-1] if first_author else "Unknown"
             # Remove special characters
-            last_name = re.sub(r'[^a-zA-Z]', '', last_name)
+            last_name = _alpha_only(last_name)
             key_parts.append(last_name)
         else:
             key_parts.append("Unknown")
@@ -153,8 +266,8 @@ class ExportService:
             title_words = paper.title.split()
             for word in title_words:
                 # Skip common words
-                if word.lower() not in ['a', 'an', 'the', 'of', 'in', 'on', 'at', 'to', 'for']:
-                    clean_word = re.sub(r'[^a-zA-Z]', '', word)
+                if word.lower() not in _STOPWORD_SET:
+                    clean_word = _alpha_only(word)
                     if clean_word:
                         key_parts.append(clean_word)
                         break
@@ -170,14 +283,23 @@ class ExportService:
         bib_filename: Optional[str] = None
     ) -> str:
         """Export document content to LaTeX format."""
-        # Get document
+        # Get document and whether it has papers in one round trip
+        has_papers_clause = exists().where(DocumentPaper.document_id == Document.id)
         result = await db.execute(
-            select(Document)
+            select(Document, has_papers_clause.label("has_papers"))
+            .options(
+                load_only(
+                    Document.title, Document.description, Document.content, Document.plain_text,
+                    raiseload=True,
+                ),
+                raiseload("*"),
+            )
             .where(Document.id == document_id, Document.owner_id == user_id)
         )
-        document = result.scalar_one_or_none()
-        if not document:
+        row = result.one_or_none()
+        if not row:
             raise ValueError("Document not found")
+        document, has_papers = row
         
         # Start LaTeX document
         latex_lines = [
@@ -216,13 +338,6 @@ class ExportService:
             latex_lines.append(ExportService._escape_latex(document.plain_text))
         
         # Add bibliography section if papers are assigned
-        result = await db.execute(
-            select(DocumentPaper)
-            .where(DocumentPaper.document_id == document_id)
-            .limit(1)
-        )
-        has_papers = result.scalar_one_or_none() is not None
-        
         if has_papers:
             # Use custom bibliography filename if provided, otherwise use document title
             if bib_filename:
@@ -246,26 +361,10 @@ class ExportService:
         """Escape special LaTeX characters."""
         if not text:
             return ""
-        
-        # LaTeX special characters
-        replacements = {
-            '\\': '\\textbackslash{}',
-            '{': '\\{',
-            '}': '\\}',
-            '$': '\\$',
-            '&': '\\&',
-            '#': '\\#',
-            '^': '\\textasciicircum{}',
-            '_': '\\_',
-            '~': '\\textasciitilde{}',
-            '%': '\\%',
-        }
-        
-        result = text
-        for char, replacement in replacements.items():
-            result = result.replace(char, replacement)
-        
-        return result
+        if len(text) <= _ESCAPE_CACHE_MAX_LENGTH:
+            return _escape_latex_cached(text)
+        # Single pass, so the braces in \textbackslash{} are not escaped again
+        return text.translate(_LATEX_ESCAPE_TABLE)
     
     @staticmethod
     def _convert_lexical_to_latex(content: Dict[str, Any]) -> str:
@@ -274,174 +373,174 @@ class ExportService:
         # to handle all Lexical node types properly
         latex_parts = []
         
-        
         if "root" in content and "children" in content["root"]:
-            for node in content["root"]["children"]:
-                latex_part = ExportService._convert_lexical_node_to_latex(node)
-                if latex_part:
-                    latex_parts.append(latex_part)
+            ExportService._render_latex(content["root"]["children"], latex_parts)
         
         return "\n\n".join(latex_parts)
     
     @staticmethod
-    def _convert_child_node_to_latex(node: Dict[str, Any]) -> str:
-        """Convert a child node to LaTeX, handling different node types."""
-        node_type = node.get("type", "")
-        
-        if node_type == "text":
-            text = node.get("text", "")
-            # Handle text formatting
-            if node.get("format", 0) & 1:  # Bold
-                text = f"\\textbf{{{ExportService._escape_latex(text)}}}"
-            elif node.get("format", 0) & 2:  # Italic
-                text = f"\\textit{{{ExportService._escape_latex(text)}}}"
+    def _render_latex(nodes: List[Dict[str, Any]], out: List[str]) -> None:
+        """Render block-level nodes into out using an explicit stack instead of recursion.
+        
+        Each stack frame is (node, kind, target, parts). An entry frame has parts=None;
+        container nodes push a closing frame holding the list their children render
+        into, and the closing frame combines those parts into the node's LaTeX.
+        """
+        stack = [(node, _BLOCK, out, None) for node in reversed(nodes)]
+        
+        while stack:
+            node, kind, target, parts = stack.pop()
+            node_type = node.get("type", "")
+            
+            if parts is not None:
+                latex = ExportService._finish_latex_node(node, node_type, kind, parts)
+                if latex:
+                    target.append(latex)
+                continue
+            
+            if kind == _ITEM_CHILD:
+                if node_type == "paragraph":
+                    # Paragraphs inside list items are flattened into the item
+                    for child in reversed(node.get("children", [])):
+                        stack.append((child, _INLINE, target, None))
+                    continue
+                kind = _INLINE
+            
+            if kind == _INLINE:
+                latex = ExportService._convert_child_node_to_latex(node)
+            elif kind == _ITEM:
+                child_kind = _ITEM_CHILD if node_type == "listitem" else _INLINE
+                latex = None
             else:
-                text = ExportService._escape_latex(text)
-            return text
-        
-        elif node_type == "citation":
-            # Handle citation nodes
-            # Try different possible field names for the citation key
-            citation_key = node.get("citationKey") or node.get("citation_key") or node.get("key") or ""
-            if citation_key:
-                return f"\\cite{{{citation_key}}}"
-            # Fallback to paperId if no citation key
-            paper_id = node.get("paperId") or node.get("paper_id") or ""
-            if paper_id:
-                return f"\\cite{{{paper_id}}}"
-            # Last resort - use any available identifier
-            return f"\\cite{{unknown}}"
-        
-        # For other types, try to extract text content
-        return ExportService._get_text_from_node(node)
+                handler = _BLOCK_LEAF_HANDLERS.get(node_type)
+                if handler:
+                    latex = handler(node)
+                else:
+                    # listitem and unknown types render their children as blocks
+                    child_kind = _BLOCK_CHILD_KINDS.get(node_type, _BLOCK)
+                    latex = None
+            
+            if latex is not None:
+                if latex:
+                    target.append(latex)
+                continue
+            
+            child_parts = []
+            stack.append((node, kind, target, child_parts))
+            for child in reversed(node.get("children", [])):
+                stack.append((child, child_kind, child_parts, None))
+    
+    @staticmethod
+    def _finish_latex_node(node: Dict[str, Any], node_type: str, kind: int, parts: List[str]) -> str:
+        """Combine the rendered children of a container node."""
+        if kind == _ITEM:
+            text = " ".join(parts)
+            if not text and node_type != "listitem":
+                text = ExportService._get_text_from_node(node)
+            return f"  \\item {text}"
+        
+        finisher = _BLOCK_FINISHERS.get(node_type)
+        return finisher(node, parts) if finisher else " ".join(parts)
+    
+    @staticmethod
+    def _heading_latex(node: Dict[str, Any], parts: List[str]) -> str:
+        """Wrap rendered heading children in the sectioning command for its level."""
+        level = int(node.get("tag", "h1")[1])  # h1 -> 1, h2 -> 2, etc.
+        command = _SECTION_COMMANDS[level] if level < len(_SECTION_COMMANDS) else "\\paragraph"
+        return f"{command}{{{' '.join(parts) or ExportService._get_text_from_node(node)}}}"
+    
+    @staticmethod
+    def _list_latex(node: Dict[str, Any], parts: List[str]) -> str:
+        """Wrap rendered list items in an itemize or enumerate environment."""
+        env = "itemize" if node.get("listType", "bullet") == "bullet" else "enumerate"
+        return f"\\begin{{{env}}}\n" + "\n".join(parts) + f"\n\\end{{{env}}}"
+    
+    @staticmethod
+    def _quote_latex(node: Dict[str, Any], parts: List[str]) -> str:
+        """Wrap rendered quote children in a quote environment."""
+        text = " ".join(parts) or ExportService._escape_latex(ExportService._get_text_from_node(node))
+        return f"\\begin{{quote}}\n{text}\n\\end{{quote}}"
+    
+    @staticmethod
+    def _code_latex(node: Dict[str, Any]) -> str:
+        """Convert a code node to a verbatim block."""
+        return f"\\begin{{verbatim}}\n{node.get('text', '')}\n\\end{{verbatim}}"
+    
+    @staticmethod
+    def _convert_child_node_to_latex(node: Dict[str, Any]) -> str:
+        """Convert an inline node to LaTeX, falling back to its plain text."""
+        handler = _INLINE_HANDLERS.get(node.get("type", ""))
+        return handler(node) if handler else ExportService._get_text_from_node(node)
+    
+    @staticmethod
+    def _text_latex(node: Dict[str, Any]) -> str:
+        """Convert a text node to escaped, formatted LaTeX."""
+        text = ExportService._escape_latex(node.get("text", ""))
+        fmt = node.get("format", 0)
+        if fmt:
+            # Wrap once per set format bit so combined formats nest
+            for bit, command in _FORMAT_COMMANDS:
+                if fmt & bit:
+                    text = f"{command}{{{text}}}"
+        return text
+    
+    @staticmethod
+    def _citation_latex(node: Dict[str, Any]) -> str:
+        """Convert a citation node to \\cite, falling back to the paper id and then "unknown"."""
+        citation_key = next((node[field] for field in _CITATION_KEY_FIELDS if node.get(field)), "unknown")
+        return f"\\cite{{{citation_key}}}"
     
     @staticmethod
     def _convert_lexical_node_to_latex(node: Dict[str, Any]) -> str:
         """Convert a single Lexical node to LaTeX."""
-        node_type = node.get("type", "")
-        
-        
-        if node_type == "paragraph":
-            text_parts = []
-            for child in node.get("children", []):
-                child_latex = ExportService._convert_child_node_to_latex(child)
-                if child_latex:
-                    text_parts.append(child_latex)
-            return " ".join(text_parts)
-        
-        elif node_type == "heading":
-            level = int(node.get("tag", "h1")[1])  # h1 -> 1, h2 -> 2, etc.
-            section_commands = {
-                1: "\\section",
-                2: "\\subsection",
-                3: "\\subsubsection",
-                4: "\\paragraph",
-                5: "\\subparagraph"
-            }
-            command = section_commands.get(level, "\\paragraph")
-            # Process heading children to preserve citations
-            text_parts = []
-            for child in node.get("children", []):
-                child_latex = ExportService._convert_child_node_to_latex(child)
-                if child_latex:
-                    text_parts.append(child_latex)
-            text = " ".join(text_parts) if text_parts else ExportService._get_text_from_node(node)
-            return f"{command}{{{text}}}"
-        
-        elif node_type == "list":
-            list_type = node.get("listType", "bullet")
-            env = "itemize" if list_type == "bullet" else "enumerate"
-            items = []
-            for child in node.get("children", []):
-                # List items might be wrapped in listitem nodes
-                if child.get("type") == "listitem":
-                    # Process listitem's children
-                    item_parts = []
-                    for grandchild in child.get("children", []):
-                        if grandchild.get("type") == "paragraph":
-                            # Process paragraph's children
-                            for ggchild in grandchild.get("children", []):
-                                ggchild_latex = ExportService._convert_child_node_to_latex(ggchild)
-                                if ggchild_latex:
-                                    item_parts.append(ggchild_latex)
-                        else:
-                            grandchild_latex = ExportService._convert_child_node_to_latex(grandchild)
-                            if grandchild_latex:
-                                item_parts.append(grandchild_latex)
-                    item_text = " ".join(item_parts)
-                else:
-                    # Process other types of list children
-                    item_parts = []
-                    for grandchild in child.get("children", []):
-                        grandchild_latex = ExportService._convert_child_node_to_latex(grandchild)
-                        if grandchild_latex:
-                            item_parts.append(grandchild_latex)
-                    item_text = " ".join(item_parts) if item_parts else ExportService._get_text_from_node(child)
-                items.append(f"  \\item {item_text}")
-            
-            return f"\\begin{{{env}}}\n" + "\n".join(items) + f"\n\\end{{{env}}}"
-        
-        elif node_type == "quote":
-            # Process quote children to preserve citations
-            text_parts = []
-            for child in node.get("children", []):
-                child_latex = ExportService._convert_child_node_to_latex(child)
-                if child_latex:
-                    text_parts.append(child_latex)
-            text = " ".join(text_parts) if text_parts else ExportService._escape_latex(ExportService._get_text_from_node(node))
-            return f"\\begin{{quote}}\n{text}\n\\end{{quote}}"
-        
-        elif node_type == "code":
-            text = node.get("text", "")
-            return f"\\begin{{verbatim}}\n{text}\n\\end{{verbatim}}"
-        
-        elif node_type == "citation":
-            # Handle citation nodes at the root level
-            # Try different possible field names for the citation key
-            citation_key = node.get("citationKey") or node.get("citation_key") or node.get("key") or ""
-            if citation_key:
-                return f"\\cite{{{citation_key}}}"
-            # Fallback to paperId if no citation key
-            paper_id = node.get("paperId") or node.get("paper_id") or ""
-            if paper_id:
-                return f"\\cite{{{paper_id}}}"
-            # Last resort - use any available identifier
-            return f"\\cite{{unknown}}"
-        
-        elif node_type == "listitem":
-            # Handle list item nodes specifically
-            item_parts = []
-            for child in node.get("children", []):
-                child_latex = ExportService._convert_lexical_node_to_latex(child)
-                if child_latex:
-                    item_parts.append(child_latex)
-            return " ".join(item_parts)
-        
-        # For other node types, process children if they exist
-        children = node.get("children", [])
-        if children:
-            child_parts = []
-            for child in children:
-                child_latex = ExportService._convert_lexical_node_to_latex(child)
-                if child_latex:
-                    child_parts.append(child_latex)
-            return " ".join(child_parts)
-        
-        return ""
+        parts = []
+        ExportService._render_latex([node], parts)
+        return parts[0] if parts else ""
     
     @staticmethod
     def _get_text_from_node(node: Dict[str, Any]) -> str:
         """Extract plain text from a Lexical node."""
-        text_parts = []
-        
         if "text" in node:
             return node["text"]
         
-        for child in node.get("children", []):
+        # Collect every descendant's text into one list and join once
+        text_parts = []
+        stack = list(reversed(node.get("children", [])))
+        while stack:
+            child = stack.pop()
             if child.get("type") == "text":
                 text_parts.append(child.get("text", ""))
+            elif "text" in child:
+                text_parts.append(child["text"])
+            elif child.get("children"):
+                stack.extend(reversed(child["children"]))
             else:
-                # Recursively get text from child nodes
-                text_parts.append(ExportService._get_text_from_node(child))
+                # Empty containers still count as a part, as they did when joined per level
+                text_parts.append("")
         
-        return " ".join(text_parts)
\ No newline at end of file
+        return " ".join(text_parts)
+
+
+# Node type handlers, looked up once per node instead of walking an if/elif chain
+_INLINE_HANDLERS = {
+    "text": ExportService._text_latex,
+    "citation": ExportService._citation_latex,
+}
+# Block nodes rendered directly, without visiting children
+_BLOCK_LEAF_HANDLERS = {
+    "code": ExportService._code_latex,
+    "citation": ExportService._citation_latex,
+}
+# How the children of block containers are rendered (default: as blocks)
+_BLOCK_CHILD_KINDS = {
+    "paragraph": _INLINE,
+    "heading": _INLINE,
+    "quote": _INLINE,
+    "list": _ITEM,
+}
+# Block containers that wrap their rendered children (default: joined with spaces)
+_BLOCK_FINISHERS = {
+    "heading": ExportService._heading_latex,
+    "list": ExportService._list_latex,
+    "quote": ExportService._quote_latex,
+}
@@ -1,22 +1,156 @@
 """External metadata fetching service for academic papers."""
 import re
+import asyncio
 import logging
-import xml.etree.ElementTree as ET
-from typing import Dict, Optional, List, Any
+from collections import OrderedDict
+from typing import Dict, Optional, List, Any, Tuple
 from datetime import datetime
 import httpx
+import orjson
+from lxml import etree
 import bibtexparser
+from bibtexparser.bibdatabase import STANDARD_TYPES
 from bibtexparser.bparser import BibTexParser
 from bibtexparser.customization import convert_to_unicode
+from bibtexparser.latexenc import latex_to_unicode
+
+try:
+    import h2
+except ImportError:  # HTTP/2 support is optional (httpx[http2]); fall back to HTTP/1.1
+    h2 = None
 
 logger = logging.getLogger(__name__)
 
+# Shared client so metadata fetches reuse pooled (and, with h2, multiplexed) connections
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client for metadata APIs, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=h2 is not None,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _http_client
+
+
+# arXiv Atom feed queries, compiled once
+_ATOM_NAMESPACE = {'atom': 'http://www.w3.org/2005/Atom'}
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+_ARXIV_ENTRIES = etree.XPath('//atom:entry', namespaces=_ATOM_NAMESPACE)
+# Entry fields are read in one pass over the entry's children, dispatching on these tags
+_ATOM_TITLE = '{http://www.w3.org/2005/Atom}title'
+_ATOM_AUTHOR = '{http://www.w3.org/2005/Atom}author'
+_ATOM_NAME = '{http://www.w3.org/2005/Atom}name'
+_ATOM_SUMMARY = '{http://www.w3.org/2005/Atom}summary'
+_ATOM_PUBLISHED = '{http://www.w3.org/2005/Atom}published'
+_ATOM_LINK = '{http://www.w3.org/2005/Atom}link'
+_ATOM_CATEGORY = '{http://www.w3.org/2005/Atom}category'
+
+
+# Identifier patterns, compiled once for text extraction and ID validation
+# Patterns: arXiv:2506.06352v1, arXiv:2506.06352, 2506.06352v1, DOI with arXiv
+_ARXIV_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r'arXiv[:\s]+(\d{4}\.\d{4,5}(?:v\d+)?)',
+        r'10\.48550/arXiv\.(\d{4}\.\d{4,5}(?:v\d+)?)',  # DOI pattern for arXiv
+        r'/arXiv\.(\d{4}\.\d{4,5}(?:v\d+)?)',  # Anywhere in DOI
+        # Just the number pattern; the word boundary is checked after the first digit
+        # so the scan can skip straight to digits
+        r'(\d(?<!\w\d)\d{3}\.\d{4,5}(?:v\d+)?)\b'
+    )
+]
+# Patterns: 10.xxxx/yyyy, doi:10.xxxx/yyyy, https://doi.org/10.xxxx/yyyy
+_DOI_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r'(?:doi[:\s]+|https?://doi\.org/)(10\.\d{4,}/[-._;()/:\w]+)',
+        r'\b(10\.\d{4,}/[-._;()/:\w]+)\b'
+    )
+]
+_ARXIV_DOI_RE = re.compile(r'arXiv\.(\d{4}\.\d{4,5}(?:v\d+)?)', re.IGNORECASE)
+_PMID_RE = re.compile(r'(?:PMID|pmid)[:\s]+(\d+)')
+# YYMM.NNNNN or YYMM.NNNN or older format
+_ARXIV_ID_FMT = re.compile(r'^\d{4}\.\d{4,5}(v\d+)?$|^[a-z\-]+/\d{7}(v\d+)?$')
+
+
+# Per-host request limits shared by all client instances (clients are created per paper)
+HOST_CONCURRENCY_LIMITS = {"arxiv": 10, "crossref": 20}
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_host_semaphore(host: str) -> asyncio.Semaphore:
+    """Get the semaphore bounding concurrent requests to a host."""
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = _host_semaphores[host] = asyncio.Semaphore(HOST_CONCURRENCY_LIMITS[host])
+    return semaphore
+
+
+# Successful lookups by (source, cleaned identifier), shared by all client instances so
+# re-imports of the same papers skip the network
+_METADATA_CACHE_SIZE = 10000
+_metadata_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+
+
+def _get_cached_metadata(source: str, identifier: str) -> Optional[Dict[str, Any]]:
+    """Return a copy of cached metadata, marking it recently used, or None on a miss."""
+    metadata = _metadata_cache.get((source, identifier))
+    if metadata is None:
+        return None
+    _metadata_cache.move_to_end((source, identifier))
+    return dict(metadata)
+
+
+def _cache_metadata(source: str, identifier: str, metadata: Dict[str, Any]):
+    """Cache a copy of fetched metadata, evicting the least recently used entry when full."""
+    _metadata_cache[(source, identifier)] = dict(metadata)
+    _metadata_cache.move_to_end((source, identifier))
+    if len(_metadata_cache) > _METADATA_CACHE_SIZE:
+        _metadata_cache.popitem(last=False)
+
+
+# Single-entry BibTeX with brace-delimited fields, the common case, is read with these
+# instead of bibtexparser's much slower pure-Python grammar
+_BIB_ENTRY_RE = re.compile(r'\s*@(\w+)\s*\{[^,]+,\s*(.*?)\n\s*\}', re.DOTALL)
+_BIB_FIELD_RE = re.compile(r'(\w+)\s*=\s*\{((?:[^{}]|\{[^{}]*\})*)\}')
+_BIB_SEPARATORS = ' \t\r\n,'
+
+
+def _parse_bibtex_fast(bibtex_string: str) -> Optional[Dict[str, str]]:
+    """Read the first BibTeX entry like bibtexparser would, or None if it needs the full parser."""
+    if '\t' in bibtex_string:
+        return None  # bibtexparser expands tabs to columns
+    match = _BIB_ENTRY_RE.match(bibtex_string)
+    if not match or match.group(1).lower() not in STANDARD_TYPES:
+        return None
+    body = match.group(2)
+    # Quoted values, string macros, deeper brace nesting etc. leave text behind
+    if _BIB_FIELD_RE.sub('', body).strip(_BIB_SEPARATORS):
+        return None
+
+    entry = {}
+    for name, value in _BIB_FIELD_RE.findall(body):
+        lines = value.splitlines()
+        value = '\n'.join(lines[:1] + [line.lstrip() for line in lines[1:]])
+        entry.setdefault(name.lower(), latex_to_unicode(value))  # The first duplicate wins
+    return entry or None
+
+
+async def close_http_client():
+    """Close the shared HTTP client."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 
 class ArxivClient:
     """Client for fetching metadata from arXiv API."""
     
     BASE_URL = "https://export.arxiv.org/api/query"
-    NAMESPACE = {'atom': 'http://www.w3.org/2005/Atom'}
+    NAMESPACE = _ATOM_NAMESPACE
     
     def __init__(self, timeout: int = 30):
         self.timeout = timeout
@@ -35,29 +169,35 @@ class ArxivClient:
             # Clean the arXiv ID
             arxiv_id = self._clean_arxiv_id(arxiv_id)
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(
+            cached = _get_cached_metadata("arxiv", arxiv_id)
+            if cached is not None:
+                return cached
+            
+            async with get_host_semaphore("arxiv"):
+                response = await get_http_client().get(
                     self.BASE_URL,
-                    params={"id_list": arxiv_id}
+                    params={"id_list": arxiv_id},
+                    timeout=self.timeout
                 )
-                response.raise_for_status()
-                
-                # Parse XML response
-                root = ET.fromstring(response.text)
-                
-                # Find the entry
-                entry = root.find('.//atom:entry', self.NAMESPACE)
-                if entry is None:
-                    logger.warning(f"No entry found for arXiv ID: {arxiv_id}")
-                    return None
-                
-                # Extract metadata
-                metadata = self._extract_metadata_from_entry(entry)
-                metadata['arxiv_id'] = arxiv_id
-                metadata['source'] = 'arxiv'
-                
-                return metadata
-                
+            response.raise_for_status()
+            
+            # Parse XML response
+            root = etree.fromstring(response.content, _XML_PARSER)
+            
+            # Find the entry
+            entries = _ARXIV_ENTRIES(root)
+            if not entries:
+                logger.warning(f"No entry found for arXiv ID: {arxiv_id}")
+                return None
+            
+            # Extract metadata
+            metadata = self._extract_metadata_from_entry(entries[0])
+            metadata['arxiv_id'] = arxiv_id
+            metadata['source'] = 'arxiv'
+            _cache_metadata("arxiv", arxiv_id, metadata)
+            
+            return metadata
+            
         except Exception as e:
             logger.error(f"Error fetching arXiv metadata for {arxiv_id}: {e}")
             return None
@@ -70,63 +210,77 @@ class ArxivClient:
         
         # Validate format (YYMM.NNNNN or YYMM.NNNN or older format)
         # Updated to handle both 4 and 5 digit IDs after the dot
-        if not re.match(r'^\d{4}\.\d{4,5}(v\d+)?$|^[a-z\-]+/\d{7}(v\d+)?$', arxiv_id):
+        if not _ARXIV_ID_FMT.match(arxiv_id):
             logger.warning(f"Invalid arXiv ID format: {arxiv_id}")
         
         return arxiv_id
     
-    def _extract_metadata_from_entry(self, entry: ET.Element) -> Dict[str, Any]:
+    def _extract_metadata_from_entry(self, entry: etree._Element) -> Dict[str, Any]:
         """Extract metadata from an arXiv entry element."""
         metadata = {}
+        title = summary = published = doi_url = pdf_url = None
+        authors = []
+        categories = []
+        
+        for child in entry:
+            tag = child.tag
+            if tag == _ATOM_AUTHOR:
+                for name in child.iterchildren(_ATOM_NAME):
+                    if name.text:
+                        authors.append(name.text.strip())
+            elif tag == _ATOM_LINK:
+                href = child.get('href')
+                if href is None:
+                    continue
+                if doi_url is None and child.get('title') == 'doi':
+                    doi_url = href
+                if pdf_url is None and child.get('type') == 'application/pdf':
+                    pdf_url = href
+            elif tag == _ATOM_CATEGORY:
+                term = child.get('term')
+                if term:
+                    categories.append(term)
+            elif tag == _ATOM_TITLE:
+                if title is None:
+                    title = ''.join(child.itertext())
+            elif tag == _ATOM_SUMMARY:
+                if summary is None:
+                    summary = ''.join(child.itertext())
+            elif tag == _ATOM_PUBLISHED:
+                if published is None:
+                    published = ''.join(child.itertext())
         
         # Title
-        title_elem = entry.find('atom:title', self.NAMESPACE)
-        if title_elem is not None and title_elem.text:
+        if title and title.split():
             # Clean up title (remove newlines and extra spaces)
-            metadata['title'] = ' '.join(title_elem.text.strip().split())
+            metadata['title'] = ' '.join(title.split())
         
         # Authors
-        authors = []
-        for author_elem in entry.findall('atom:author', self.NAMESPACE):
-            name_elem = author_elem.find('atom:name', self.NAMESPACE)
-            if name_elem is not None and name_elem.text:
-                authors.append(name_elem.text.strip())
         if authors:
             metadata['authors'] = authors
         
         # Abstract
-        summary_elem = entry.find('atom:summary', self.NAMESPACE)
-        if summary_elem is not None and summary_elem.text:
-            metadata['abstract'] = ' '.join(summary_elem.text.strip().split())
+        if summary and summary.split():
+            metadata['abstract'] = ' '.join(summary.split())
         
         # Published date
-        published_elem = entry.find('atom:published', self.NAMESPACE)
-        if published_elem is not None and published_elem.text:
+        if published:
             try:
-                pub_date = datetime.fromisoformat(published_elem.text.replace('Z', '+00:00'))
+                pub_date = datetime.fromisoformat(published.replace('Z', '+00:00'))
                 metadata['year'] = pub_date.year
-                metadata['published_date'] = published_elem.text
+                metadata['published_date'] = published
             except:
                 pass
         
         # DOI if available
-        doi_elem = entry.find('.//atom:link[@title="doi"]', self.NAMESPACE)
-        if doi_elem is not None:
-            doi_url = doi_elem.get('href', '')
-            if 'doi.org/' in doi_url:
-                metadata['doi'] = doi_url.split('doi.org/')[-1]
+        if doi_url and 'doi.org/' in doi_url:
+            metadata['doi'] = doi_url.split('doi.org/')[-1]
         
         # PDF URL
-        pdf_elem = entry.find('.//atom:link[@type="application/pdf"]', self.NAMESPACE)
-        if pdf_elem is not None:
-            metadata['pdf_url'] = pdf_elem.get('href', '')
+        if pdf_url is not None:
+            metadata['pdf_url'] = pdf_url
         
         # Categories
-        categories = []
-        for cat_elem in entry.findall('atom:category', self.NAMESPACE):
-            term = cat_elem.get('term', '')
-            if term:
-                categories.append(term)
         if categories:
             metadata['categories'] = categories
             # Use first category as venue/journal approximation
@@ -161,26 +315,35 @@ class CrossrefClient:
             # Clean DOI
             doi = self._clean_doi(doi)
             
-            async with httpx.AsyncClient(timeout=self.timeout, headers=self.headers) as client:
-                response = await client.get(f"{self.BASE_URL}/works/{doi}")
-                
-                if response.status_code == 404:
-                    logger.warning(f"DOI not found: {doi}")
-                    return None
-                    
-                response.raise_for_status()
-                
-                data = response.json()
-                if 'message' not in data:
-                    return None
-                
-                # Extract metadata
-                metadata = self._extract_metadata_from_work(data['message'])
-                metadata['doi'] = doi
-                metadata['source'] = 'crossref'
-                
-                return metadata
+            cached = _get_cached_metadata("crossref", doi)
+            if cached is not None:
+                return cached
+            
+            async with get_host_semaphore("crossref"):
+                response = await get_http_client().get(
+                    f"{self.BASE_URL}/works/{doi}",
+                    headers=self.headers,
+                    timeout=self.timeout
+                )
+            
+            if response.status_code == 404:
+                logger.warning(f"DOI not found: {doi}")
+                return None
                 
+            response.raise_for_status()
+            
+            data = orjson.loads(response.content)
+            if 'message' not in data:
+                return None
+            
+            # Extract metadata
+            metadata = self._extract_metadata_from_work(data['message'])
+            metadata['doi'] = doi
+            metadata['source'] = 'crossref'
+            _cache_metadata("crossref", doi, metadata)
+            
+            return metadata
+            
         except Exception as e:
             logger.error(f"Error fetching Crossref metadata for {doi}: {e}")
             return None
@@ -302,44 +465,28 @@ class MetadataFetcherService:
         identifiers = {}
         
         # Extract arXiv ID
-        # Patterns: arXiv:2506.06352v1, arXiv:2506.06352, 2506.06352v1, DOI with arXiv
-        arxiv_patterns = [
-            r'arXiv[:\s]+(\d{4}\.\d{4,5}(?:v\d+)?)',
-            r'arxiv[:\s]+(\d{4}\.\d{4,5}(?:v\d+)?)',
-            r'10\.48550/arXiv\.(\d{4}\.\d{4,5}(?:v\d+)?)',  # DOI pattern for arXiv
-            r'/arXiv\.(\d{4}\.\d{4,5}(?:v\d+)?)',  # Anywhere in DOI
-            r'\b(\d{4}\.\d{4,5}(?:v\d+)?)\b'  # Just the number pattern
-        ]
-        
-        for pattern in arxiv_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _ARXIV_PATTERNS:
+            match = pattern.search(text)
             if match:
                 identifiers['arxiv_id'] = match.group(1)
                 break
         
         # Extract DOI
-        # Patterns: 10.xxxx/yyyy, doi:10.xxxx/yyyy, https://doi.org/10.xxxx/yyyy
-        doi_patterns = [
-            r'(?:doi[:\s]+|https?://doi\.org/)(10\.\d{4,}/[-._;()/:\w]+)',
-            r'\b(10\.\d{4,}/[-._;()/:\w]+)\b'
-        ]
-        
-        for pattern in doi_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _DOI_PATTERNS:
+            match = pattern.search(text)
             if match:
                 doi = match.group(1)
                 identifiers['doi'] = doi
                 
                 # If it's an arXiv DOI and we haven't found an arXiv ID yet, extract it
                 if 'arxiv_id' not in identifiers and 'arXiv' in doi:
-                    arxiv_match = re.search(r'arXiv\.(\d{4}\.\d{4,5}(?:v\d+)?)', doi, re.IGNORECASE)
+                    arxiv_match = _ARXIV_DOI_RE.search(doi)
                     if arxiv_match:
                         identifiers['arxiv_id'] = arxiv_match.group(1)
                 break
         
         # Extract PMID (PubMed ID)
-        pmid_pattern = r'(?:PMID|pmid)[:\s]+(\d+)'
-        match = re.search(pmid_pattern, text)
+        match = _PMID_RE.search(text)
         if match:
             identifiers['pmid'] = match.group(1)
         
@@ -360,15 +507,17 @@ class MetadataFetcherService:
             Dictionary with paper metadata or None if parsing fails
         """
         try:
-            parser = BibTexParser()
-            parser.customization = convert_to_unicode
-            bib_database = bibtexparser.loads(bibtex_string, parser=parser)
-            
-            if not bib_database.entries:
-                return None
-            
-            # Take the first entry
-            entry = bib_database.entries[0]
+            entry = _parse_bibtex_fast(bibtex_string)
+            if entry is None:
+                # A parser accumulates every string it parses, so each call needs its own
+                parser = BibTexParser(customization=convert_to_unicode)
+                bib_database = bibtexparser.loads(bibtex_string, parser=parser)
+                
+                if not bib_database.entries:
+                    return None
+                
+                # Take the first entry
+                entry = bib_database.entries[0]
             metadata = {}
             
             # Map BibTeX fields to our metadata schema
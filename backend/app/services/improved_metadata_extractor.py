@@ -1,10 +1,52 @@
 """Improved metadata extraction for academic papers."""
 import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
 from typing import Dict, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Patterns applied per line, compiled once
+# URLs, '@' (which covers email addresses) and dates in common formats
+_RE_METADATA = re.compile(r'https?://|www\.|@|\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b')
+_RE_PARENS = re.compile(r'\([^)]*\)')
+_RE_SUPERSCRIPT = re.compile(r'[0-9\*†‡§¶]+')
+_RE_AND = re.compile(r'\s+and\s+', re.IGNORECASE)
+_RE_ABSTRACT_HEAD = re.compile(r'^(?:#+\s*)?abstract\s*$', re.IGNORECASE)
+_RE_ABSTRACT_INLINE = re.compile(r'^abstract[:\s]+(.+)$', re.IGNORECASE)
+_RE_SECTION_BREAK = re.compile(r'#|\d+\.?\s+[A-Z]')  # Markdown or numbered heading, matched at line start
+_RE_YEAR = re.compile(r'\b(?:19[5-9]\d|20[0-2]\d)\b')
+
+# Keyword classes, each found with one scan of the lowercased line (in CPython's re this
+# is several times faster than the same alternation with re.IGNORECASE)
+_RE_HEADER_FOOTER = re.compile(
+    r'page |copyright|©|all rights reserved|preprint|arxiv:|doi:|isbn|issn|'
+    r'vol\.|no\.|pp\.|journal|conference|proceedings'
+)
+_RE_SKIP_AUTHOR_LINE = re.compile(
+    r'abstract|introduction|keywords|doi:|copyright|received|accepted|published|corresponding'
+)
+_RE_NON_TITLE_SECTION = re.compile(r'abstract|introduction|references|acknowledgments')
+_RE_TITLE_KEYWORD = re.compile(
+    r'analysis|study|approach|method|system|framework|investigation|examination|review|survey|model'
+)
+_NON_TITLE_STARTS = ('figure', 'table', 'algorithm', 'equation', 'section', 'chapter')
+_NAME_FORBIDDEN = frozenset('@/\\|<>[]{}')
+
+HEAD_LINES = 200  # Leading lines searched for the title and authors
+# Publication years are searched for in the front matter and the references at the end
+YEAR_HEAD_CHARS = 2048
+YEAR_TAIL_CHARS = 4096
+_CURRENT_YEAR = datetime.now(timezone.utc).year
+
+
+@lru_cache(maxsize=1024)
+def _clean_author_line(line: str) -> str:
+    """Remove parenthesised affiliations, numbers and footnote symbols from a line."""
+    # Cached: the line after each title candidate is checked as authors and then parsed
+    return _RE_SUPERSCRIPT.sub('', _RE_PARENS.sub('', line))
 
 class ImprovedMetadataExtractor:
     """Enhanced metadata extraction with better heuristics for academic papers."""
@@ -17,16 +59,18 @@ class ImprovedMetadataExtractor:
             Dict with title, authors, abstract, year
         """
         lines = text.split('\n')
+        # Stripped once for the title and author heuristics, which only read the start
+        head = [line.strip() for line in islice(lines, HEAD_LINES)]
         metadata = {}
         
         # Try multiple strategies for title extraction
-        title_info = self._extract_title_advanced(lines)
+        title_info = self._extract_title_advanced(lines, head)
         if title_info:
             metadata['title'] = title_info[0]
             title_line_idx = title_info[1]
             
             # Extract authors based on title location
-            authors = self._extract_authors_near_title(lines, title_line_idx)
+            authors = self._extract_authors_near_title(head, title_line_idx)
             if authors:
                 metadata['authors'] = authors
         
@@ -42,10 +86,14 @@ class ImprovedMetadataExtractor:
             
         return metadata
     
-    def _extract_title_advanced(self, lines: List[str]) -> Optional[Tuple[str, int]]:
+    def _extract_title_advanced(self, lines: List[str], stripped_lines: List[str]) -> Optional[Tuple[str, int]]:
         """
         Extract title using multiple advanced strategies.
         
+        Args:
+            lines: Lines of the paper
+            stripped_lines: The first HEAD_LINES lines, stripped
+        
         Returns:
             Tuple of (title, line_index) or None
         """
@@ -53,20 +101,15 @@ class ImprovedMetadataExtractor:
         title_candidates = []
         
         # First, try markdown headings
-        for i, line in enumerate(lines[:100]):
-            if line.startswith('# ') and len(line.strip()) > 10:
-                clean_title = line[2:].strip()
+        for i, (line, stripped) in enumerate(islice(zip(lines, stripped_lines), 100)):
+            if line.startswith('# ') and len(stripped) > 10:
+                clean_title = stripped[2:].lstrip()
                 # Skip if it's a section heading
-                if not any(word in clean_title.lower() for word in ['abstract', 'introduction', 'references', 'acknowledgments']):
+                if not _RE_NON_TITLE_SECTION.search(clean_title.lower()):
                     return (clean_title, i)
         
         # Strategy 2: Look for title patterns in first 50 lines
-        in_header_section = True
-        found_substantial_text = False
-        
-        for i, line in enumerate(lines[:50]):
-            stripped = line.strip()
-            
+        for i, stripped in enumerate(islice(stripped_lines, 50)):
             # Skip empty lines
             if not stripped:
                 continue
@@ -79,57 +122,46 @@ class ImprovedMetadataExtractor:
             if self._contains_metadata_elements(stripped):
                 continue
             
-            # Look for title characteristics
-            if len(stripped) >= 10:
-                found_substantial_text = True
-                
-                # Check if this could be a title
-                if self._looks_like_title(stripped, lines, i):
-                    title_candidates.append((stripped, i, self._calculate_title_score(stripped, lines, i)))
+            # Check if this could be a title
+            score = self._score_title_candidate(stripped, stripped_lines, i)
+            if score is not None:
+                title_candidates.append((stripped, i, score))
         
-        # Sort candidates by score and return the best one
+        # Return the best-scoring candidate (the earliest one on ties)
         if title_candidates:
-            title_candidates.sort(key=lambda x: x[2], reverse=True)
-            best_candidate = title_candidates[0]
+            best_candidate = max(title_candidates, key=lambda x: x[2])
             return (best_candidate[0], best_candidate[1])
         
         return None
     
-    def _looks_like_title(self, text: str, lines: List[str], index: int) -> bool:
-        """Check if text looks like a paper title."""
+    def _score_title_candidate(self, text: str, stripped_lines: List[str], index: int) -> Optional[float]:
+        """Score how likely text is to be the paper title, or None if it does not look like one."""
         # Length constraints
         if len(text) < 10 or len(text) > 300:
-            return False
+            return None
             
         # Should not end with punctuation (except ? or !)
         if text.endswith(('.', ',', ';', ':')):
-            return False
+            return None
             
         # Should not start with common non-title words
-        non_title_starts = ['figure', 'table', 'algorithm', 'equation', 'section', 'chapter']
-        if any(text.lower().startswith(word) for word in non_title_starts):
-            return False
-            
-        # Check capitalization pattern
+        lower_text = text.lower()
+        if lower_text.startswith(_NON_TITLE_STARTS):
+            return None
+        
         words = text.split()
-        if len(words) >= 2:
-            # Count capitalized words (excluding short words)
-            significant_words = [w for w in words if len(w) > 3]
-            if significant_words:
-                capitalized = sum(1 for w in significant_words if w[0].isupper())
-                if capitalized / len(significant_words) > 0.5:
-                    return True
+        next_line = stripped_lines[index + 1] if index + 1 < len(stripped_lines) else None
+        next_is_authors = next_line is not None and self._looks_like_authors(next_line)
+        
+        # Mostly capitalized (ignoring short words), followed by authors, or at least 3 words
+        significant_words = [w for w in words if len(w) > 3]
+        title_case = (
+            len(words) >= 2 and bool(significant_words)
+            and sum(1 for w in significant_words if w[0].isupper()) / len(significant_words) > 0.5
+        )
+        if not (title_case or next_is_authors or len(words) >= 3):
+            return None
         
-        # Check if followed by author-like content
-        if index + 1 < len(lines):
-            next_line = lines[index + 1].strip()
-            if self._looks_like_authors(next_line):
-                return True
-                
-        return len(words) >= 3  # At least 3 words
-    
-    def _calculate_title_score(self, text: str, lines: List[str], index: int) -> float:
-        """Calculate a score for how likely this text is to be the title."""
         score = 0.0
         
         # Length score (prefer medium length titles)
@@ -141,51 +173,31 @@ class ImprovedMetadataExtractor:
         score += (50 - index) / 50 if index < 50 else 0
         
         # Capitalization score
-        words = text.split()
-        if words:
-            cap_ratio = sum(1 for w in words if w and w[0].isupper()) / len(words)
-            score += cap_ratio
+        score += sum(1 for w in words if w[0].isupper()) / len(words)
         
         # Following line score
-        if index + 1 < len(lines):
-            next_line = lines[index + 1].strip()
-            if self._looks_like_authors(next_line):
-                score += 2.0
-            elif not next_line:  # Empty line after
-                score += 0.5
+        if next_is_authors:
+            score += 2.0
+        elif next_line == '':  # Empty line after
+            score += 0.5
                 
         # Question mark bonus (research questions are common in titles)
         if '?' in text:
             score += 0.5
             
         # Keyword bonus
-        title_keywords = ['analysis', 'study', 'approach', 'method', 'system', 'framework', 
-                         'investigation', 'examination', 'review', 'survey', 'model']
-        if any(keyword in text.lower() for keyword in title_keywords):
+        if _RE_TITLE_KEYWORD.search(lower_text):
             score += 0.3
             
         return score
     
     def _is_header_footer(self, text: str) -> bool:
         """Check if text is likely a header or footer."""
-        lower_text = text.lower()
-        patterns = ['page ', 'copyright', '©', 'all rights reserved', 
-                   'preprint', 'arxiv:', 'doi:', 'isbn', 'issn', 
-                   'vol.', 'no.', 'pp.', 'journal', 'conference', 'proceedings']
-        return any(pattern in lower_text for pattern in patterns)
+        return _RE_HEADER_FOOTER.search(text.lower()) is not None
     
     def _contains_metadata_elements(self, text: str) -> bool:
         """Check if text contains metadata elements."""
-        # URLs
-        if any(pattern in text for pattern in ['http://', 'https://', 'www.', '@']):
-            return True
-        # Dates in common formats
-        if re.search(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', text):
-            return True
-        # Email addresses
-        if re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text):
-            return True
-        return False
+        return _RE_METADATA.search(text) is not None
     
     def _looks_like_authors(self, text: str) -> bool:
         """Check if text looks like an author line."""
@@ -195,14 +207,13 @@ class ImprovedMetadataExtractor:
         # Common author patterns
         if ',' in text or ' and ' in text.lower():
             # Remove common suffixes and check if names remain
-            clean_text = re.sub(r'\([^)]*\)', '', text)  # Remove parentheses
-            clean_text = re.sub(r'[0-9\*†‡§¶]+', '', clean_text)  # Remove numbers and symbols
+            clean_text = _clean_author_line(text)
             
             # Split by commas or 'and'
             if ',' in clean_text:
                 parts = [p.strip() for p in clean_text.split(',')]
             else:
-                parts = re.split(r'\s+and\s+', clean_text, flags=re.IGNORECASE)
+                parts = _RE_AND.split(clean_text)
             
             # Check if parts look like names
             valid_parts = 0
@@ -215,19 +226,15 @@ class ImprovedMetadataExtractor:
             
         return False
     
-    def _extract_authors_near_title(self, lines: List[str], title_idx: int) -> Optional[List[str]]:
+    def _extract_authors_near_title(self, stripped_lines: List[str], title_idx: int) -> Optional[List[str]]:
         """Extract authors near the title line."""
         # Look in the next 15 lines after title
-        for i in range(title_idx + 1, min(title_idx + 15, len(lines))):
-            line = lines[i].strip()
-            
+        for line in islice(stripped_lines, title_idx + 1, title_idx + 15):
             if not line:
                 continue
                 
             # Skip if it's clearly not authors
-            skip_words = ['abstract', 'introduction', 'keywords', 'doi:', 'copyright', 
-                         'received', 'accepted', 'published', 'corresponding']
-            if any(word in line.lower() for word in skip_words):
+            if _RE_SKIP_AUTHOR_LINE.search(line.lower()):
                 continue
                 
             # Try to extract authors
@@ -240,9 +247,7 @@ class ImprovedMetadataExtractor:
     def _parse_author_line(self, line: str) -> Optional[List[str]]:
         """Parse a line to extract author names."""
         # Clean the line
-        clean_line = re.sub(r'\([^)]*\)', '', line)  # Remove parentheses
-        clean_line = re.sub(r'[0-9\*†‡§¶]+', '', clean_line)  # Remove numbers and symbols
-        clean_line = clean_line.strip()
+        clean_line = _clean_author_line(line).strip()
         
         if not clean_line:
             return None
@@ -257,7 +262,7 @@ class ImprovedMetadataExtractor:
                     authors.append(part)
         # Try 'and' separation
         elif ' and ' in clean_line.lower():
-            parts = re.split(r'\s+and\s+', clean_line, flags=re.IGNORECASE)
+            parts = _RE_AND.split(clean_line)
             for part in parts:
                 part = part.strip()
                 if self._is_valid_name(part):
@@ -283,7 +288,7 @@ class ImprovedMetadataExtractor:
             return False
             
         # Shouldn't contain certain characters
-        if any(char in text for char in ['@', '/', '\\', '|', '<', '>', '[', ']', '{', '}']):
+        if not _NAME_FORBIDDEN.isdisjoint(text):
             return False
             
         return True
@@ -292,57 +297,72 @@ class ImprovedMetadataExtractor:
         """Extract abstract section."""
         abstract_lines = []
         in_abstract = False
+        section_done = False
+        # First "Abstract" followed by text on the same/next lines, used without a heading
+        inline_abstract = None
         
         for i, line in enumerate(lines):
+            stripped = line.strip()
+            
+            if inline_abstract is None and 'abstract' in line.lower() and i + 1 < len(lines):
+                inline_abstract = self._abstract_after(lines, i)
+            
+            if section_done:
+                if inline_abstract is not None:
+                    return inline_abstract
+                continue
+            
             # Check for abstract heading
-            if re.match(r'^(#+\s*)?abstract\s*$', line.strip(), re.IGNORECASE):
+            if _RE_ABSTRACT_HEAD.match(stripped):
                 in_abstract = True
-                continue
             elif in_abstract:
                 # Stop at next section
-                if line.startswith('#') or re.match(r'^\d+\.?\s+[A-Z]', line):
-                    break
-                elif line.strip():
-                    abstract_lines.append(line.strip())
+                if _RE_SECTION_BREAK.match(line):
+                    if abstract_lines:
+                        break
+                    section_done = True
+                elif stripped:
+                    abstract_lines.append(stripped)
                     
         if abstract_lines:
             return ' '.join(abstract_lines)
-            
-        # Alternative: Look for "Abstract" followed by text on same/next line
-        for i, line in enumerate(lines):
-            if 'abstract' in line.lower() and i + 1 < len(lines):
-                # Check if abstract starts on same line
-                match = re.match(r'^abstract[:\s]+(.+)$', line, re.IGNORECASE)
-                if match:
-                    abstract_text = match.group(1).strip()
-                    if len(abstract_text) > 50:
-                        return abstract_text
-                # Check next lines
-                else:
-                    next_lines = []
-                    for j in range(i + 1, min(i + 10, len(lines))):
-                        if lines[j].strip():
-                            next_lines.append(lines[j].strip())
-                        else:
-                            break
-                    if next_lines and len(' '.join(next_lines)) > 50:
-                        return ' '.join(next_lines)
-                        
-        return None
+        return inline_abstract
+    
+    def _abstract_after(self, lines: List[str], index: int) -> Optional[str]:
+        """Read an abstract from an "Abstract" line, or None if there is not enough text."""
+        # Check if abstract starts on same line
+        match = _RE_ABSTRACT_INLINE.match(lines[index])
+        if match:
+            abstract_text = match.group(1).strip()
+            return abstract_text if len(abstract_text) > 50 else None
+        
+        # Check next lines
+        next_lines = []
+        for line in islice(lines, index + 1, index + 10):
+            line = line.strip()
+            if not line:
+                break
+            next_lines.append(line)
+        abstract_text = ' '.join(next_lines)
+        return abstract_text if len(abstract_text) > 50 else None
     
     def _extract_year(self, text: str) -> Optional[int]:
         """Extract publication year."""
-        # Look for 4-digit years
-        year_pattern = re.compile(r'\b(19[5-9]\d|20[0-2]\d)\b')
-        years = year_pattern.findall(text)
-        
-        if years:
-            # Convert to integers and get the most recent
-            year_ints = [int(y) for y in years]
-            # Filter out unlikely years
-            current_year = 2025
-            valid_years = [y for y in year_ints if 1950 <= y <= current_year]
-            if valid_years:
-                return max(valid_years)
-                
-        return None
\ No newline at end of file
+        if len(text) > YEAR_HEAD_CHARS + YEAR_TAIL_CHARS:
+            year = self._latest_year(text[:YEAR_HEAD_CHARS]) or 0
+            year = max(year, self._latest_year(text[-YEAR_TAIL_CHARS:]) or 0)
+            if year:
+                return year
+        # Short papers, or none found near the start or end: search the whole text
+        return self._latest_year(text)
+    
+    def _latest_year(self, text: str) -> Optional[int]:
+        """Return the most recent plausible 4-digit year in text."""
+        latest = None
+        for match in _RE_YEAR.finditer(text):
+            year = int(match.group())
+            if year == _CURRENT_YEAR:
+                return year  # Nothing later is plausible
+            if year < _CURRENT_YEAR and (latest is None or year > latest):
+                latest = year
+        return latest
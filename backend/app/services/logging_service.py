@@ -1,16 +1,73 @@
 """Logging service for creating and managing system logs."""
+import logging
 import traceback
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, insert, select, delete, literal_column, tuple_
 from sqlalchemy.sql import func
 
 from app.models.system_log import SystemLog, LogLevel, LogCategory
 from app.schemas.system_log import SystemLogCreate, SystemLogFilter
 
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 10000  # Old logs deleted per transaction
+
+# Logs are write-only rows, so they are inserted without the ORM unit of work
+_LOG_INSERT = insert(SystemLog).returning(SystemLog.id, SystemLog.created_at)
+
+
+def logs_cutoff(days: int) -> datetime:
+    """Naive UTC time the given number of days ago, comparable with SystemLog.created_at."""
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+
+
+def old_logs_batch_delete(cutoff_date: datetime):
+    """Statement deleting up to DELETE_BATCH_SIZE logs created before the cutoff.
+    
+    PostgreSQL has no DELETE ... LIMIT, so the batch is picked by physical row id.
+    """
+    ctid = literal_column("ctid")
+    batch = (
+        select(ctid)
+        .select_from(SystemLog)
+        .where(SystemLog.created_at < cutoff_date)
+        .limit(DELETE_BATCH_SIZE)
+    )
+    return (
+        delete(SystemLog)
+        .where(ctid.in_(batch))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def log_stats_query(cutoff_date: datetime):
+    """Statement counting logs since the cutoff per level, per category and in total."""
+    # One grouped scan; level and category are never NULL, so a NULL marks the rollup
+    return (
+        select(SystemLog.level, SystemLog.category, func.count(SystemLog.id).label("count"))
+        .where(SystemLog.created_at >= cutoff_date)
+        .group_by(func.grouping_sets(tuple_(SystemLog.level), tuple_(SystemLog.category), tuple_()))
+    )
+
+
+def split_log_stats(rows) -> Tuple[int, Dict[LogLevel, int], Dict[LogCategory, int]]:
+    """Route log_stats_query rows into (total, counts by level, counts by category)."""
+    total = 0
+    level_counts = {}
+    category_counts = {}
+    for level, category, count in rows:
+        if level is not None:
+            level_counts[level] = count
+        elif category is not None:
+            category_counts[category] = count
+        else:
+            total = count
+    return total, level_counts, category_counts
+
 
 class LoggingService:
     """Service for managing system logs."""
@@ -32,7 +89,7 @@ class LoggingService:
         auto_commit: bool = True
     ) -> SystemLog:
         """Create a new system log entry."""
-        log = SystemLog(
+        values = dict(
             level=level,
             category=category,
             message=message,
@@ -43,19 +100,19 @@ class LoggingService:
             entity_id=entity_id
         )
         
-        self.db.add(log)
-        
-        if auto_commit:
-            try:
+        try:
+            row = self.db.execute(_LOG_INSERT, values).one()
+            if auto_commit:
                 self.db.commit()
-                self.db.refresh(log)
-            except Exception:
+        except Exception:
+            if auto_commit:
                 self.db.rollback()
-                # If we can't log to DB, at least print to console
-                print(f"[{level}] {category}: {message}")
-                raise
+                # If we can't log to DB, at least keep it in the application log
+                logger.exception(f"Failed to store system log [{level}] {category}: {message}")
+            raise
         
-        return log
+        # RETURNING already carries the generated columns, so nothing needs refreshing
+        return SystemLog(id=row.id, created_at=row.created_at, **values)
     
     def log_error(
         self,
@@ -67,8 +124,12 @@ class LoggingService:
         entity_type: Optional[str] = None,
         entity_id: Optional[str] = None
     ) -> SystemLog:
-        """Log an error with traceback."""
-        error_trace = traceback.format_exc()
+        """Log an error with its traceback, if it was raised."""
+        # Format the error's own traceback rather than whatever exception is being handled;
+        # errors that were created but never raised have none
+        error_trace = None
+        if error.__traceback__ is not None:
+            error_trace = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
         
         if details is None:
             details = {}
@@ -134,89 +195,80 @@ class LoggingService:
         per_page: int = 50
     ) -> tuple[list[SystemLog], int]:
         """Get filtered logs with pagination."""
-        query = self.db.query(SystemLog)
+        # The total comes from a window count over the same scan that returns the page
+        query = select(SystemLog, func.count().over().label("total"))
         
         # Apply filters
+        criteria = []
         if filter_params.level:
-            query = query.filter(SystemLog.level == filter_params.level)
+            criteria.append(SystemLog.level == filter_params.level)
         
         if filter_params.category:
-            query = query.filter(SystemLog.category == filter_params.category)
+            criteria.append(SystemLog.category == filter_params.category)
         
         if filter_params.user_id:
-            query = query.filter(SystemLog.user_id == filter_params.user_id)
+            criteria.append(SystemLog.user_id == filter_params.user_id)
         
         if filter_params.entity_type:
-            query = query.filter(SystemLog.entity_type == filter_params.entity_type)
+            criteria.append(SystemLog.entity_type == filter_params.entity_type)
         
         if filter_params.entity_id:
-            query = query.filter(SystemLog.entity_id == filter_params.entity_id)
+            criteria.append(SystemLog.entity_id == filter_params.entity_id)
         
         if filter_params.start_date:
-            query = query.filter(SystemLog.created_at >= filter_params.start_date)
+            criteria.append(SystemLog.created_at >= filter_params.start_date)
         
         if filter_params.end_date:
-            query = query.filter(SystemLog.created_at <= filter_params.end_date)
+            criteria.append(SystemLog.created_at <= filter_params.end_date)
         
         if filter_params.search:
-            search_term = f"%{filter_params.search}%"
-            query = query.filter(SystemLog.message.ilike(search_term))
+            # Substring search, served by the message trigram index
+            criteria.append(SystemLog.message.ilike(f"%{filter_params.search}%"))
         
-        # Get total count
-        total = query.count()
+        if criteria:
+            query = query.where(and_(*criteria))
         
         # Apply pagination and ordering
-        query = query.order_by(desc(SystemLog.created_at))
-        query = query.offset((page - 1) * per_page).limit(per_page)
+        page_query = query.order_by(desc(SystemLog.created_at))
+        page_query = page_query.offset((page - 1) * per_page).limit(per_page)
         
-        logs = query.all()
+        rows = self.db.execute(page_query).all()
+        if rows:
+            return [row.SystemLog for row in rows], rows[0].total
         
-        return logs, total
+        # A page past the end has no rows to carry the total
+        total = 0
+        if page > 1:
+            total = self.db.execute(
+                select(func.count()).select_from(query.with_only_columns(SystemLog.id).subquery())
+            ).scalar()
+        return [], total
     
     def delete_old_logs(self, days: int = 30) -> int:
         """Delete logs older than specified days."""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        
-        deleted_count = self.db.query(SystemLog).filter(
-            SystemLog.created_at < cutoff_date
-        ).delete()
-        
-        self.db.commit()
+        cutoff_date = logs_cutoff(days)
         
-        return deleted_count
+        # Small transactions keep row locks short and the WAL per commit bounded
+        stmt = old_logs_batch_delete(cutoff_date)
+        deleted_count = 0
+        while True:
+            result = self.db.execute(stmt)
+            self.db.commit()
+            deleted_count += result.rowcount
+            if result.rowcount < DELETE_BATCH_SIZE:
+                return deleted_count
     
     def get_log_stats(self, days: int = 7) -> Dict[str, Any]:
         """Get log statistics for the specified number of days."""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Count by level
-        level_counts = dict(
-            self.db.query(SystemLog.level, func.count(SystemLog.id))
-            .filter(SystemLog.created_at >= cutoff_date)
-            .group_by(SystemLog.level)
-            .all()
-        )
+        cutoff_date = logs_cutoff(days)
         
-        # Count by category
-        category_counts = dict(
-            self.db.query(SystemLog.category, func.count(SystemLog.id))
-            .filter(SystemLog.created_at >= cutoff_date)
-            .group_by(SystemLog.category)
-            .all()
+        total_count, level_counts, category_counts = split_log_stats(
+            self.db.execute(log_stats_query(cutoff_date))
         )
         
-        # Total count
-        total_count = self.db.query(func.count(SystemLog.id)).filter(
-            SystemLog.created_at >= cutoff_date
-        ).scalar()
-        
         return {
             "total": total_count,
             "by_level": level_counts,
             "by_category": category_counts,
             "period_days": days
         }
-
-
-# Import timedelta at the top
-from datetime import timedelta
\ No newline at end of file
@@ -0,0 +1,18 @@
+"""MarkItDown conversion run inside the paper extraction worker processes.
+
+Spawned workers import this module to unpickle the task, so it must only
+depend on markitdown and not on the rest of the app.
+"""
+from functools import lru_cache
+from markitdown import MarkItDown
+
+
+@lru_cache(maxsize=1)
+def get_markitdown() -> MarkItDown:
+    """Return the worker process's converter, built on first use and reused across papers."""
+    return MarkItDown()
+
+
+def markitdown_convert(file_path: str) -> str:
+    """Convert a file to markdown text."""
+    return get_markitdown().convert(file_path).text_content
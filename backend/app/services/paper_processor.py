@@ -1,364 +1,358 @@
 """Paper processing service using MarkItDown for text extraction."""
 import os
 import re
-from typing import List, Dict, Optional, Tuple
+from typing import List, Optional, Tuple
 from uuid import UUID
 import asyncio
-from markitdown import MarkItDown
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import defer
 
 from app.db.session import AsyncSessionLocal
 from app.models import Paper, PaperChunk
-from app.services.embedding import EmbeddingService
+from app.services.embedding import get_embedding_service
 # TextChunkingService is defined in this file
 from app.core.config import settings
 from app.utils.logging_utils import log_async_info, log_async_error
 from app.models.system_log import LogCategory
 from app.services.improved_metadata_extractor import ImprovedMetadataExtractor
 from app.services.external_metadata_service import MetadataFetcherService
+from app.services.citation_engine import invalidate_suggestion_cache
+from app.services.markitdown_worker import markitdown_convert
 import logging
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_BATCH_SIZE = 32  # Chunks embedded per model forward pass
+PIPELINE_QUEUE_SIZE = 2  # Papers buffered between pipeline stages
+LOAD_WORKERS = 2  # Concurrent text extractions
+
+_RE_WORD = re.compile(r'\S+')  # Words located by offset when chunking
+
+# MarkItDown parsing is CPU-bound, so it runs in worker processes off the event loop.
+# Workers are spawned rather than forked from the threaded server process, and only
+# LOAD_WORKERS extractions run at once, so the pool is sized to match.
+def _new_extract_pool() -> ProcessPoolExecutor:
+    """Create the text extraction worker pool."""
+    return ProcessPoolExecutor(
+        max_workers=LOAD_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+_extract_pool = _new_extract_pool()
+
+
+async def _run_extraction(file_path: str) -> str:
+    """Convert a file in the extraction pool, replacing the pool once if a worker died."""
+    global _extract_pool
+    loop = asyncio.get_running_loop()
+    pool = _extract_pool
+    try:
+        return await loop.run_in_executor(pool, markitdown_convert, file_path)
+    except BrokenProcessPool:
+        logger.warning("Text extraction pool broke, restarting it")
+        # Concurrent extractions fail together; only the first replaces the pool
+        if _extract_pool is pool:
+            _extract_pool = _new_extract_pool()
+            pool.shutdown(wait=False, cancel_futures=True)
+        return await loop.run_in_executor(_extract_pool, markitdown_convert, file_path)
+
+
+async def shutdown_extract_pool() -> None:
+    """Stop the text extraction worker processes without blocking the event loop."""
+    await asyncio.to_thread(_extract_pool.shutdown, wait=True, cancel_futures=True)
+
+
+class _PaperJob:
+    """A paper moving through the processing pipeline, with its own database session."""
+    
+    def __init__(self, paper_id: str, file_path: str):
+        self.paper_id = paper_id
+        self.file_path = file_path
+        self.db = AsyncSessionLocal()
+        self.paper: Optional[Paper] = None
+        self.markdown_text = ""
+        self.chunks: List['TextChunk'] = []
+        self.texts: List[str] = []  # Chunk contents, followed by the abstract if there is one
+        self.embeddings: List = []
+
 
 class PaperProcessorService:
     """Service for processing uploaded papers."""
     
     def __init__(self):
-        self.markitdown = MarkItDown()
-        self.embedding_service = EmbeddingService()
+        self.embedding_service = get_embedding_service()
         self.chunking_service = TextChunkingService()
         self.metadata_extractor = ImprovedMetadataExtractor()
         self.external_metadata_service = MetadataFetcherService(email="support@academic-citation.com")
     
     @classmethod
     async def process_paper(cls, paper_id: str, file_path: str) -> None:
+        """Process a single paper file asynchronously."""
+        await cls.process_papers([(paper_id, file_path)])
+    
+    @classmethod
+    async def process_papers(cls, papers: List[Tuple[str, str]]) -> None:
         """
-        Process a paper file asynchronously.
+        Process (paper_id, file_path) pairs through a staged pipeline.
         
-        Steps:
-        1. Extract text using MarkItDown
-        2. Extract metadata from the text
-        3. Chunk the text
-        4. Generate embeddings
-        5. Store everything in the database
+        Stages run as worker pools connected by bounded queues, so papers overlap:
+        while one paper is embedded the next is extracted and the previous stored.
+        1. Load: extract text using MarkItDown
+        2. Transform: extract metadata and chunk the text
+        3. Embed: generate embeddings, batching chunks across papers
+        4. Upsert: store everything in the database
         """
         processor = cls()
+        queues = [asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in range(4)]
+        load_q, transform_q, embed_q, upsert_q = queues
         
-        async with AsyncSessionLocal() as db:
+        workers = [
+            *(asyncio.create_task(processor._stage_worker(processor._load, load_q, transform_q))
+              for _ in range(LOAD_WORKERS)),
+            asyncio.create_task(processor._stage_worker(processor._transform, transform_q, embed_q)),
+            asyncio.create_task(processor._embed_worker(embed_q, upsert_q)),
+            asyncio.create_task(processor._stage_worker(processor._upsert, upsert_q)),
+        ]
+        try:
+            for paper_id, file_path in papers:
+                await load_q.put(_PaperJob(paper_id, file_path))
+            # Each stage hands a paper on before marking it done, so joining in order drains the pipeline
+            for queue in queues:
+                await queue.join()
+            # Cached suggestions were computed against the corpus before these papers
+            await invalidate_suggestion_cache()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def _stage_worker(self, stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue] = None) -> None:
+        """Run a pipeline stage on each paper from inbox, passing it on unless the stage drops it."""
+        while True:
+            job = await inbox.get()
             try:
-                # Get paper from database
-                paper = await db.get(Paper, UUID(paper_id))
-                if not paper:
-                    logger.error(f"Paper {paper_id} not found")
-                    return
-                
-                logger.info(f"Processing paper {paper_id}: {paper.title}")
-                
-                # Log processing start
-                await log_async_info(
-                    db,
-                    LogCategory.PDF_PROCESSING,
-                    f"Starting PDF processing for paper: {paper.title}",
-                    entity_type="paper",
-                    entity_id=str(paper_id),
-                    details={"file_path": file_path}
-                )
-                
-                # Extract text using MarkItDown
-                markdown_text = processor._extract_text(file_path)
-                if not markdown_text:
-                    raise ValueError("Failed to extract text from file")
-                
-                # First try to extract identifiers from original filename (stored in title)
-                identifiers = {}
-                import re
-                # Check if the paper title (which contains original filename) has an arXiv ID
-                if paper.title:
-                    arxiv_match = re.search(r'(\d{4}\.\d{4,5}(?:v\d+)?)', paper.title)
-                    if arxiv_match:
-                        identifiers['arxiv_id'] = arxiv_match.group(1)
-                        logger.info(f"Found arXiv ID in original filename: {identifiers['arxiv_id']}")
-                
-                # Also try to extract identifiers from the text
-                text_identifiers = processor.external_metadata_service.extract_identifiers_from_text(markdown_text[:5000])  # Check first 5000 chars
-                identifiers.update(text_identifiers)
-                
-                metadata = None
-                if identifiers:
-                    logger.info(f"Found identifiers: {identifiers}")
-                    metadata = await processor.external_metadata_service.fetch_metadata(identifiers)
-                
-                # If external APIs didn't work, fall back to text extraction
-                if not metadata:
-                    logger.info("No metadata from external APIs, falling back to text extraction")
-                    metadata = processor.metadata_extractor.extract_metadata(markdown_text)
+                if await stage(job) and outbox is not None:
+                    await outbox.put(job)
                 else:
-                    # Add identifiers to metadata
-                    metadata.update(identifiers)
-                
-                # Update paper with extracted metadata
-                paper.title = metadata.get('title', paper.title)
-                paper.authors = metadata.get('authors', paper.authors)
-                paper.abstract = metadata.get('abstract', paper.abstract)
-                paper.year = metadata.get('year', paper.year)
-                paper.journal = metadata.get('journal', metadata.get('venue', paper.journal))
-                paper.doi = metadata.get('doi', paper.doi)
-                paper.arxiv_id = metadata.get('arxiv_id', paper.arxiv_id)
-                paper.citation_count = metadata.get('citation_count', paper.citation_count)
-                paper.source_url = metadata.get('url', metadata.get('pdf_url', paper.source_url))
-                paper.metadata_source = metadata.get('source', 'text_extraction')
-                paper.full_text = markdown_text
-                
-                # Chunk the text (250 words with 50-word overlap for better granularity)
-                chunks = processor.chunking_service.chunk_text(
-                    markdown_text,
-                    chunk_size=250,  # Reduced from 500 for better search granularity
-                    overlap_size=50,
-                    respect_sentences=True
-                )
-                
-                logger.info(f"Created {len(chunks)} chunks for paper {paper_id}")
-                
-                # Delete existing chunks for this paper (in case of reprocessing)
-                existing_chunks = await db.execute(
-                    select(PaperChunk).where(PaperChunk.paper_id == UUID(paper_id))
-                )
-                for chunk in existing_chunks.scalars():
-                    await db.delete(chunk)
-                
-                # Create and embed each chunk
-                paper_chunks = []
-                for i, chunk in enumerate(chunks):
-                    # Generate embedding for this chunk
-                    chunk_embedding = await processor.embedding_service.generate_embedding(chunk.content)
-                    
-                    # Create PaperChunk record
-                    paper_chunk = PaperChunk(
-                        paper_id=UUID(paper_id),
-                        content=chunk.content,
-                        chunk_index=i,
-                        start_char=chunk.start_char,
-                        end_char=chunk.end_char,
-                        word_count=chunk.word_count,
-                        embedding=chunk_embedding,
-                        section_title=chunk.section_title
-                    )
-                    db.add(paper_chunk)
-                    paper_chunks.append(paper_chunk)
-                    
-                    # Log progress for long documents
-                    if (i + 1) % 10 == 0:
-                        logger.info(f"Processed {i + 1}/{len(chunks)} chunks for paper {paper_id}")
-                
-                # Also generate and store a main embedding for the paper (abstract or first chunk)
-                embedding_text = paper.abstract if paper.abstract else chunks[0].content if chunks else ""
-                if embedding_text:
-                    embedding = await processor.embedding_service.generate_embedding(embedding_text)
-                    paper.embedding = embedding
-                
-                # Mark as processed
-                paper.is_processed = True
-                paper.processing_error = None
-                
-                # Save everything
-                await db.commit()
-                
-                logger.info(f"Successfully stored {len(paper_chunks)} chunks with embeddings for paper {paper_id}")
-                
-                # Log success
-                await log_async_info(
-                    db,
-                    LogCategory.PDF_PROCESSING,
-                    f"Successfully processed PDF for paper: {paper.title}",
-                    entity_type="paper",
-                    entity_id=str(paper_id),
-                    details={
-                        "chunks_created": len(paper_chunks),
-                        "text_length": len(markdown_text),
-                        "has_abstract": bool(paper.abstract)
-                    }
-                )
-                
-                logger.info(f"Successfully processed paper {paper_id}")
-                
+                    await job.db.close()
             except Exception as e:
-                logger.error(f"Error processing paper {paper_id}: {str(e)}")
-                
-                # Log error
-                await log_async_error(
-                    db,
-                    LogCategory.PDF_PROCESSING,
-                    f"Failed to process PDF for paper: {paper.title if paper else paper_id}",
-                    e,
-                    entity_type="paper",
-                    entity_id=str(paper_id),
-                    details={"file_path": file_path, "error": str(e)}
-                )
-                
-                # Update paper with error
-                if paper:
-                    paper.processing_error = str(e)
-                    await db.commit()
+                await self._fail(job, e)
+            finally:
+                inbox.task_done()
     
-    def _extract_text(self, file_path: str) -> str:
-        """Extract text from file using MarkItDown."""
-        try:
-            # Check if file exists
-            if not os.path.exists(file_path):
-                logger.error(f"File not found: {file_path}")
-                raise FileNotFoundError(f"File not found: {file_path}")
+    async def _embed_worker(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        """Embed the texts of waiting papers together so small papers share forward passes."""
+        while True:
+            jobs = [await inbox.get()]
+            while sum(len(job.texts) for job in jobs) < EMBEDDING_BATCH_SIZE and not inbox.empty():
+                jobs.append(inbox.get_nowait())
             
-            result = self.markitdown.convert(file_path)
-            return result.text_content
-        except Exception as e:
-            logger.error(f"MarkItDown extraction failed: {e}")
-            if isinstance(e, FileNotFoundError):
-                raise
-            return ""
+            try:
+                embeddings = await self.embedding_service.generate_batch_embeddings(
+                    [text for job in jobs for text in job.texts],
+                    batch_size=EMBEDDING_BATCH_SIZE
+                )
+            except Exception as e:
+                for job in jobs:
+                    await self._fail(job, e)
+            else:
+                offset = 0
+                for job in jobs:
+                    job.embeddings = embeddings[offset:offset + len(job.texts)]
+                    offset += len(job.texts)
+                    await outbox.put(job)
+            finally:
+                for _ in jobs:
+                    inbox.task_done()
     
-    def _extract_metadata(self, markdown_text: str) -> Dict[str, any]:
-        """
-        Extract metadata from markdown text.
+    async def _load(self, job: _PaperJob) -> bool:
+        """Fetch the paper and extract its text."""
+        # The previous full text is only ever overwritten, so it is not fetched
+        job.paper = await job.db.get(Paper, UUID(job.paper_id), options=[defer(Paper.full_text)])
+        if not job.paper:
+            logger.error(f"Paper {job.paper_id} not found")
+            return False
         
-        Looks for common patterns in academic papers:
-        - Title (usually first heading)
-        - Authors (often after title)
-        - Abstract (section marked as abstract)
-        - Year (from dates in text)
-        """
-        metadata = {}
+        logger.info(f"Processing paper {job.paper_id}: {job.paper.title}")
         
-        lines = markdown_text.split('\n')
+        # Log processing start
+        await log_async_info(
+            job.db,
+            LogCategory.PDF_PROCESSING,
+            f"Starting PDF processing for paper: {job.paper.title}",
+            entity_type="paper",
+            entity_id=str(job.paper_id),
+            details={"file_path": job.file_path}
+        )
         
-        # Extract title - try multiple strategies
-        # 1. Look for first # heading
-        for line in lines:
-            if line.startswith('# ') and 'title' not in metadata:
-                metadata['title'] = line[2:].strip()
-                break
+        # Extract text using MarkItDown
+        job.markdown_text = await self._extract_text(job.file_path)
+        if not job.markdown_text:
+            raise ValueError("Failed to extract text from file")
+        return True
+    
+    async def _transform(self, job: _PaperJob) -> bool:
+        """Extract the paper's metadata and chunk its text."""
+        paper = job.paper
+        markdown_text = job.markdown_text
         
-        # 2. If no heading found, look for title-like patterns in first 50 lines
-        if 'title' not in metadata:
-            # Look for the first substantial text block
-            found_content = False
-            potential_titles = []
-            
-            for i, line in enumerate(lines[:50]):
-                stripped = line.strip()
-                
-                # Skip empty lines
-                if not stripped:
-                    continue
-                
-                # Skip common headers/footers
-                if any(skip in stripped.lower() for skip in ['page', 'copyright', 'doi:', 'isbn', 'issn', 'vol.', 'no.']):
-                    continue
-                
-                # Skip URLs and emails
-                if any(pattern in stripped for pattern in ['http://', 'https://', 'www.', '@']):
-                    continue
-                
-                # If we find a substantial line (10+ chars), consider it
-                if len(stripped) >= 10:
-                    found_content = True
-                    
-                    # Check if it looks like a title (no ending punctuation, reasonable length)
-                    if (len(stripped) < 200 and 
-                        not stripped.endswith(('.', ',', ';', ':', '?', '!')) and
-                        not stripped.startswith(('Figure', 'Table', 'Algorithm'))):
-                        
-                        # Give higher priority to lines that are followed by author-like patterns
-                        if i + 1 < len(lines):
-                            next_line = lines[i + 1].strip()
-                            if next_line and (',' in next_line or ' and ' in next_line.lower()):
-                                metadata['title'] = stripped
-                                break
-                        
-                        # Also consider lines that are in all caps or title case
-                        words = stripped.split()
-                        if len(words) >= 2:
-                            # Check if most words start with capital (title case)
-                            capitalized_words = sum(1 for word in words if word and word[0].isupper())
-                            if capitalized_words >= len(words) * 0.7:
-                                potential_titles.append(stripped)
-                    
-                    # If we've found substantial content but no title after 10 lines, use the best candidate
-                    if found_content and i > 10 and potential_titles and 'title' not in metadata:
-                        metadata['title'] = potential_titles[0]
-                        break
+        # First try to extract identifiers from original filename (stored in title)
+        identifiers = {}
+        # Check if the paper title (which contains original filename) has an arXiv ID
+        if paper.title:
+            arxiv_match = re.search(r'(\d{4}\.\d{4,5}(?:v\d+)?)', paper.title)
+            if arxiv_match:
+                identifiers['arxiv_id'] = arxiv_match.group(1)
+                logger.info(f"Found arXiv ID in original filename: {identifiers['arxiv_id']}")
+        
+        # Also try to extract identifiers from the text
+        text_identifiers = self.external_metadata_service.extract_identifiers_from_text(markdown_text[:5000])  # Check first 5000 chars
+        identifiers.update(text_identifiers)
+        
+        metadata = None
+        if identifiers:
+            logger.info(f"Found identifiers: {identifiers}")
+            metadata = await self.external_metadata_service.fetch_metadata(identifiers)
         
-        # Extract abstract (look for Abstract section)
-        abstract_pattern = re.compile(r'^#+\s*Abstract\s*$', re.IGNORECASE)
-        in_abstract = False
-        abstract_lines = []
+        # If external APIs didn't work, fall back to text extraction
+        if not metadata:
+            logger.info("No metadata from external APIs, falling back to text extraction")
+            metadata = self.metadata_extractor.extract_metadata(markdown_text)
+        else:
+            # Add identifiers to metadata
+            metadata.update(identifiers)
         
-        for i, line in enumerate(lines):
-            if abstract_pattern.match(line):
-                in_abstract = True
-                continue
-            elif in_abstract and line.startswith('#'):
-                # End of abstract section
-                break
-            elif in_abstract and line.strip():
-                abstract_lines.append(line.strip())
+        # Update paper with extracted metadata
+        paper.title = metadata.get('title', paper.title)
+        paper.authors = metadata.get('authors', paper.authors)
+        paper.abstract = metadata.get('abstract', paper.abstract)
+        paper.year = metadata.get('year', paper.year)
+        paper.journal = metadata.get('journal', metadata.get('venue', paper.journal))
+        paper.doi = metadata.get('doi', paper.doi)
+        paper.arxiv_id = metadata.get('arxiv_id', paper.arxiv_id)
+        paper.citation_count = metadata.get('citation_count', paper.citation_count)
+        paper.source_url = metadata.get('url', metadata.get('pdf_url', paper.source_url))
+        paper.metadata_source = metadata.get('source', 'text_extraction')
+        paper.full_text = markdown_text
+        
+        # Chunk the text (250 words with 50-word overlap for better granularity)
+        job.chunks = self.chunking_service.chunk_text(
+            markdown_text,
+            chunk_size=250,  # Reduced from 500 for better search granularity
+            overlap_size=50,
+            respect_sentences=True
+        )
+        
+        logger.info(f"Created {len(job.chunks)} chunks for paper {job.paper_id}")
+        
+        # The abstract is embedded in the same batch as the chunks
+        job.texts = [chunk.content for chunk in job.chunks]
+        if paper.abstract:
+            job.texts.append(paper.abstract)
+        return True
+    
+    async def _upsert(self, job: _PaperJob) -> bool:
+        """Replace the paper's chunks and mark it processed."""
+        db = job.db
+        paper = job.paper
         
-        if abstract_lines:
-            metadata['abstract'] = ' '.join(abstract_lines)
+        # Delete existing chunks for this paper (in case of reprocessing)
+        await db.execute(delete(PaperChunk).where(PaperChunk.paper_id == UUID(job.paper_id)))
         
-        # Extract authors (heuristic: look for lines with multiple commas near the title)
-        if 'title' in metadata:
-            title_index = next((i for i, line in enumerate(lines) if metadata['title'] in line), -1)
-            if title_index >= 0:
-                # Check next few lines for author-like patterns
-                for i in range(title_index + 1, min(title_index + 10, len(lines))):
-                    line = lines[i].strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    
-                    # Skip lines that are clearly not authors
-                    if any(skip in line.lower() for skip in ['abstract', 'introduction', 'keywords', 'doi:', 'copyright']):
-                        continue
-                    
-                    # Look for author patterns
-                    # 1. Lines with commas (e.g., "John Doe, Jane Smith, Bob Johnson")
-                    if ',' in line:
-                        # Clean up the line - remove numbers, affiliations in parentheses
-                        clean_line = re.sub(r'\([^)]*\)', '', line)  # Remove parentheses
-                        clean_line = re.sub(r'\d+', '', clean_line)  # Remove numbers
-                        clean_line = re.sub(r'\*', '', clean_line)    # Remove asterisks
-                        
-                        potential_authors = [a.strip() for a in clean_line.split(',')]
-                        # Filter out empty entries and check if they look like names
-                        potential_authors = [a for a in potential_authors if a and len(a.split()) <= 5 and len(a) > 2]
-                        
-                        if len(potential_authors) >= 1:
-                            metadata['authors'] = potential_authors
-                            break
-                    
-                    # 2. Lines with "and" (e.g., "John Doe and Jane Smith")
-                    elif ' and ' in line.lower():
-                        clean_line = re.sub(r'\([^)]*\)', '', line)
-                        clean_line = re.sub(r'\d+', '', clean_line)
-                        clean_line = re.sub(r'\*', '', clean_line)
-                        
-                        potential_authors = re.split(r'\s+and\s+', clean_line, flags=re.IGNORECASE)
-                        potential_authors = [a.strip() for a in potential_authors if a.strip() and len(a.strip().split()) <= 5]
-                        
-                        if len(potential_authors) >= 1:
-                            metadata['authors'] = potential_authors
-                            break
+        # Insert the PaperChunk rows in one executemany rather than flushing an ORM object per chunk
+        paper_chunks = [
+            {
+                "paper_id": UUID(job.paper_id),
+                "content": chunk.content,
+                "chunk_index": i,
+                "start_char": chunk.start_char,
+                "end_char": chunk.end_char,
+                "word_count": chunk.word_count,
+                "embedding": chunk_embedding,
+                "section_title": chunk.section_title,
+            }
+            for i, (chunk, chunk_embedding) in enumerate(zip(job.chunks, job.embeddings))
+        ]
+        if paper_chunks:
+            await db.execute(insert(PaperChunk), paper_chunks)
         
-        # Extract year (look for 4-digit years)
-        year_pattern = re.compile(r'\b(19\d{2}|20\d{2})\b')
-        years = year_pattern.findall(markdown_text)
-        if years:
-            # Use the most recent year found
-            metadata['year'] = max(int(year) for year in years)
+        # Also store a main embedding for the paper (abstract, or the first chunk's vector)
+        if paper.abstract:
+            paper.embedding = job.embeddings[-1]
+        elif job.embeddings:
+            paper.embedding = job.embeddings[0]
         
-        return metadata
+        # Mark as processed
+        paper.is_processed = True
+        paper.processing_error = None
+        
+        # Save everything
+        await db.commit()
+        
+        logger.info(f"Successfully stored {len(paper_chunks)} chunks with embeddings for paper {job.paper_id}")
+        
+        # Log success
+        await log_async_info(
+            db,
+            LogCategory.PDF_PROCESSING,
+            f"Successfully processed PDF for paper: {paper.title}",
+            entity_type="paper",
+            entity_id=str(job.paper_id),
+            details={
+                "chunks_created": len(paper_chunks),
+                "text_length": len(job.markdown_text),
+                "has_abstract": bool(paper.abstract)
+            }
+        )
+        
+        logger.info(f"Successfully processed paper {job.paper_id}")
+        return True
+    
+    async def _fail(self, job: _PaperJob, error: Exception) -> None:
+        """Record a processing error on the paper and release its session."""
+        logger.error(f"Error processing paper {job.paper_id}: {str(error)}")
+        try:
+            # Log error
+            await log_async_error(
+                job.db,
+                LogCategory.PDF_PROCESSING,
+                f"Failed to process PDF for paper: {job.paper.title if job.paper else job.paper_id}",
+                error,
+                entity_type="paper",
+                entity_id=str(job.paper_id),
+                details={"file_path": job.file_path, "error": str(error)}
+            )
+            
+            # Update paper with error
+            if job.paper:
+                job.paper.processing_error = str(error)
+                await job.db.commit()
+        except Exception:
+            # A worker that raised would stall the pipeline
+            logger.exception(f"Failed to record processing error for paper {job.paper_id}")
+        finally:
+            await job.db.close()
+    
+    async def _extract_text(self, file_path: str) -> str:
+        """Extract text from file using MarkItDown in the extraction process pool."""
+        try:
+            # Check if file exists
+            if not os.path.exists(file_path):
+                logger.error(f"File not found: {file_path}")
+                raise FileNotFoundError(f"File not found: {file_path}")
+            
+            return await _run_extraction(file_path)
+        except Exception as e:
+            logger.error(f"MarkItDown extraction failed: {e}")
+            if isinstance(e, FileNotFoundError):
+                raise
+            return ""
 
 
 class TextChunkingService:
@@ -386,31 +380,23 @@ class TextChunkingService:
         # Simple implementation for now
         # TODO: Implement proper sentence-aware chunking
         
-        words = text.split()
+        # Word start offsets into text; chunks are slices of it rather than joined word lists
+        offsets = [m.start() for m in _RE_WORD.finditer(text)]
+        n_words = len(offsets)
+        offsets.append(len(text))
         chunks = []
-        
-        i = 0
-        chunk_id = 0
-        char_offset = 0
-        
-        # Extract section headers (simple heuristic)
-        lines = text.split('\n')
         current_section = None
         
-        while i < len(words):
-            # Get chunk_size words
-            chunk_words = words[i:i + chunk_size]
-            chunk_text = ' '.join(chunk_words)
-            
-            # Calculate character positions
-            start_char = char_offset
-            end_char = start_char + len(chunk_text)
+        # Move forward by (chunk_size - overlap_size) words per chunk
+        for chunk_id, i in enumerate(range(0, n_words, chunk_size - overlap_size)):
+            end_word = min(i + chunk_size, n_words)
+            start_char = offsets[i]
+            chunk_text = text[start_char:offsets[end_word]].rstrip()
             
             # Try to detect section title (very simple heuristic)
-            chunk_lines = chunk_text.split('\n')
-            if chunk_lines and len(chunk_lines[0]) < 100 and chunk_lines[0].strip():
+            first_line = chunk_text.split('\n', 1)[0].strip()
+            if first_line and len(first_line) < 100:
                 # Check if first line might be a section header
-                first_line = chunk_lines[0].strip()
                 if any(header in first_line.lower() for header in 
                        ['introduction', 'abstract', 'method', 'result', 'discussion', 
                         'conclusion', 'reference', 'background', 'related work']):
@@ -420,19 +406,11 @@ class TextChunkingService:
                 id=f"chunk_{chunk_id}",
                 content=chunk_text,
                 position=chunk_id,
-                word_count=len(chunk_words),
+                word_count=end_word - i,
                 start_char=start_char,
-                end_char=end_char,
+                end_char=start_char + len(chunk_text),
                 section_title=current_section
             ))
-            
-            # Move forward by (chunk_size - overlap_size)
-            i += chunk_size - overlap_size
-            chunk_id += 1
-            
-            # Update character offset (approximate)
-            if i < len(words):
-                char_offset = text.find(' '.join(words[i:i+1]))
         
         return chunks
 
@@ -440,6 +418,8 @@ class TextChunkingService:
 class TextChunk:
     """Represents a chunk of text from a paper."""
     
+    __slots__ = ('id', 'content', 'position', 'word_count', 'start_char', 'end_char', 'section_title')
+    
     def __init__(self, id: str, content: str, position: int, word_count: int, 
                  start_char: int = 0, end_char: int = 0, section_title: Optional[str] = None):
         self.id = id
@@ -1,8 +1,9 @@
 """Vector search service for finding similar papers using pgvector."""
 import numpy as np
 from typing import List, Optional, Dict, Any
-from sqlalchemy import text, select, and_, or_
+from sqlalchemy import bindparam, text, select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
+from pgvector.sqlalchemy import Vector
 from app.models.paper import Paper
 from app.core.config import settings
 from dataclasses import dataclass
@@ -11,6 +12,9 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Query embeddings are bound through pgvector's type straight from the float32 array
+_EMBEDDING_PARAM = bindparam("embedding", type_=Vector())
+
 
 @dataclass
 class SearchResult:
@@ -54,9 +58,6 @@ class VectorSearchService:
         if len(embedding) != self.vector_dim:
             raise ValueError(f"Embedding dimension mismatch: expected {self.vector_dim}, got {len(embedding)}")
             
-        # Convert numpy array to list for PostgreSQL
-        embedding_list = embedding.tolist()
-        
         # Build the base query using pgvector's <=> operator for cosine distance
         # Note: pgvector returns distance, so we convert to similarity (1 - distance)
         query_str = """
@@ -69,16 +70,16 @@ class VectorSearchService:
                 p.full_text,
                 p.journal,
                 p.doi,
-                1 - (p.embedding <=> :embedding::vector) as similarity
+                1 - (p.embedding <=> :embedding) as similarity
             FROM papers p
             WHERE 
-                1 - (p.embedding <=> :embedding::vector) > :min_similarity
+                1 - (p.embedding <=> :embedding) > :min_similarity
                 AND p.is_processed = true
         """
         
         # Prepare parameters dict
         params = {
-            "embedding": embedding_list,
+            "embedding": np.asarray(embedding, dtype=np.float32),
             "min_similarity": options.min_similarity
         }
         
@@ -106,7 +107,7 @@ class VectorSearchService:
         """
         params["limit"] = options.limit
         
-        query = text(query_str)
+        query = text(query_str).bindparams(_EMBEDDING_PARAM)
         
         try:
             # Execute the query with named parameters
@@ -180,11 +181,11 @@ class VectorSearchService:
         result = await self.db.execute(query)
         paper = result.scalar_one_or_none()
         
-        if not paper or not paper.embedding:
+        if not paper or paper.embedding is None:
             return []
             
         # Search for similar papers, excluding the source paper
-        embedding = np.array(paper.embedding)
+        embedding = np.asarray(paper.embedding, dtype=np.float32)
         results = await self.search_similar_chunks(
             embedding,
             user_id=paper.user_id or "system",
@@ -1,20 +1,20 @@
 """Simplified vector search service for pgvector - working version."""
 import numpy as np
 from typing import List, Optional, Dict, Any
-from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql import text
-from app.models.paper import Paper
-from app.models.paper_chunk import PaperChunk
+from sqlalchemy.sql import text, bindparam
+from sqlalchemy.sql.elements import TextClause
+from pgvector.sqlalchemy import Vector
 from app.core.config import settings
 from dataclasses import dataclass
 import logging
 import asyncio
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """Represents a search result from vector similarity search."""
     paper_id: str
@@ -36,6 +36,46 @@ class SearchOptions:
     filters: Optional[Dict[str, Any]] = None
 
 
+# Columns returned by chunk searches; the embedding is bound, so each statement's
+# SQL text is constant and its prepared statement and plan are reused
+_CHUNK_COLUMNS = """
+    pc.id as chunk_id,
+    pc.content as chunk_content,
+    pc.chunk_index,
+    pc.section_title,
+    p.id as paper_id,
+    p.title,
+    p.authors,
+    p.year,
+    p.abstract,
+    p.journal,
+    p.doi,
+    p.citation_count,
+    1 - (pc.embedding <=> :embedding) as similarity
+"""
+
+_EMBEDDING_PARAM = bindparam("embedding", type_=Vector())
+
+@lru_cache(maxsize=None)
+def _similar_chunks_query(has_year_from: bool, has_year_to: bool) -> TextClause:
+    """Build the similarity search statement once per combination of paper-level filters."""
+    filter_sql = ""
+    if has_year_from:
+        filter_sql += " AND p.year >= :year_from"
+    if has_year_to:
+        filter_sql += " AND p.year <= :year_to"
+        
+    return text(f"""
+        SELECT {_CHUNK_COLUMNS}
+        FROM paper_chunks pc
+        JOIN papers p ON pc.paper_id = p.id
+        WHERE p.is_processed = true
+            AND 1 - (pc.embedding <=> :embedding) > :min_similarity{filter_sql}
+        ORDER BY similarity DESC
+        LIMIT :limit
+    """).bindparams(_EMBEDDING_PARAM)
+
+
 class VectorSearchService:
     """Simplified vector search service for papers."""
     
@@ -57,104 +97,25 @@ class VectorSearchService:
             raise ValueError(f"Embedding dimension mismatch: expected {self.vector_dim}, got {len(embedding)}")
             
         try:
-            # Convert embedding to string format for PostgreSQL
-            embedding_str = '[' + ','.join(map(str, embedding.tolist())) + ']'
-            
-            # Create the similarity expression for chunks
-            from sqlalchemy import Float
-            similarity_expr = (
-                1 - func.cast(
-                    text(f"pc.embedding <=> '{embedding_str}'::vector"),
-                    Float
-                )
-            ).label('similarity')
+            params = {
+                "embedding": embedding,
+                "min_similarity": options.min_similarity,
+                "limit": options.limit,
+            }
             
-            # Build query to search chunks, not entire papers
-            query = select(
-                PaperChunk,
-                Paper,
-                similarity_expr
-            ).join(
-                Paper, PaperChunk.paper_id == Paper.id
-            ).where(
-                and_(
-                    Paper.is_processed == True,
-                    similarity_expr > options.min_similarity
-                )
-            ).order_by(
-                similarity_expr.desc()
-            ).limit(
-                options.limit * 2  # Get more chunks, then deduplicate by paper
-            )
-            
-            # Add paper-level filters if provided
-            if options.filters:
-                if "year_from" in options.filters:
-                    query = query.where(Paper.year >= options.filters["year_from"])
-                if "year_to" in options.filters:
-                    query = query.where(Paper.year <= options.filters["year_to"])
-            
-            # Execute query with alias for PaperChunk
-            query_str = str(query.compile(compile_kwargs={"literal_binds": True}))
-            query_str = query_str.replace("paper_chunks.", "pc.")
-            
-            # Use a raw query for better control
-            raw_query = f"""
-                SELECT 
-                    pc.id as chunk_id,
-                    pc.content as chunk_content,
-                    pc.chunk_index,
-                    pc.section_title,
-                    p.id as paper_id,
-                    p.title,
-                    p.authors,
-                    p.year,
-                    p.abstract,
-                    p.journal,
-                    p.doi,
-                    p.citation_count,
-                    1 - (pc.embedding <=> '{embedding_str}'::vector) as similarity
-                FROM paper_chunks pc
-                JOIN papers p ON pc.paper_id = p.id
-                WHERE p.is_processed = true
-                    AND 1 - (pc.embedding <=> '{embedding_str}'::vector) > {options.min_similarity}
-                ORDER BY similarity DESC
-                LIMIT {options.limit * 2}
-            """
+            # Paper-level filters
+            filters = options.filters or {}
+            if "year_from" in filters:
+                params["year_from"] = int(filters["year_from"])
+            if "year_to" in filters:
+                params["year_to"] = int(filters["year_to"])
             
-            result = await self.db.execute(text(raw_query))
-            rows = result.fetchall()
+            query = _similar_chunks_query("year_from" in params, "year_to" in params)
+            result = await self.db.execute(query, params)
             
-            # Convert to SearchResult objects and deduplicate by paper
-            search_results = []
-            seen_papers = set()
-            
-            for row in rows:
-                paper_id = str(row.paper_id)
-                
-                # For now, include multiple chunks from same paper (better coverage)
-                # Later we can deduplicate if needed
-                search_results.append(SearchResult(
-                    paper_id=paper_id,
-                    title=row.title,
-                    authors=row.authors or [],
-                    year=row.year or 0,
-                    abstract=row.abstract or "",
-                    similarity=float(row.similarity),
-                    chunk_text=row.chunk_content,
-                    chunk_index=row.chunk_index,
-                    metadata={
-                        "journal": row.journal,
-                        "doi": row.doi,
-                        "citation_count": row.citation_count,
-                        "section": row.section_title,
-                        "chunk_id": str(row.chunk_id)
-                    }
-                ))
-                
-                # Limit to requested number of results
-                if len(search_results) >= options.limit:
-                    break
+            # Multiple chunks from the same paper are kept (better coverage), so exactly
+            # limit rows are needed - fetching more only transferred chunk text to discard
+            search_results = [self._row_to_result(row) for row in result.fetchall()]
                 
             logger.info(f"Found {len(search_results)} similar chunks for user {user_id}")
             return search_results
@@ -163,6 +124,27 @@ class VectorSearchService:
             logger.error(f"Error in vector search: {e}")
             raise
             
+    @staticmethod
+    def _row_to_result(row) -> SearchResult:
+        """Convert a chunk search row into a SearchResult."""
+        return SearchResult(
+            paper_id=str(row.paper_id),
+            title=row.title,
+            authors=row.authors or [],
+            year=row.year or 0,
+            abstract=row.abstract or "",
+            similarity=float(row.similarity),
+            chunk_text=row.chunk_content,
+            chunk_index=row.chunk_index,
+            metadata={
+                "journal": row.journal,
+                "doi": row.doi,
+                "citation_count": row.citation_count,
+                "section": row.section_title,
+                "chunk_id": str(row.chunk_id)
+            }
+        )
+            
     async def search_multiple_indexes(
         self,
         embedding: np.ndarray,
@@ -6,6 +6,7 @@ from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime
 import logging
 import aiohttp
+import orjson
 import hashlib
 from uuid import UUID
 
@@ -312,7 +313,7 @@ class ZoteroService:
                     logger.error(f"Failed to fetch Zotero items from {library_id}: {response.status}")
                     break
                 
-                batch = await response.json()
+                batch = await response.json(loads=orjson.loads)
                 if not batch:
                     break
                 
@@ -816,7 +817,7 @@ class ZoteroService:
         
         async with self._session.get(url) as response:
             if response.status == 200:
-                group_data = await response.json()
+                group_data = await response.json(loads=orjson.loads)
                 for group in group_data:
                     data = group.get("data", {})
                     groups.append({
@@ -847,7 +848,7 @@ class ZoteroService:
         
         async with self._session.get(url) as response:
             if response.status == 200:
-                collection_data = await response.json()
+                collection_data = await response.json(loads=orjson.loads)
                 for collection in collection_data:
                     data = collection.get("data", {})
                     collections.append({
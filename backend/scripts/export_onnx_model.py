@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Export the embedding model to an INT8-quantized ONNX model for ONNX Runtime."""
+import argparse
+import os
+
+import torch
+from transformers import AutoModel, AutoTokenizer
+from onnxruntime.quantization import quantize_dynamic, QuantType
+
+
+class _TokenEmbeddings(torch.nn.Module):
+    """Wrap the transformer so the exported graph returns token embeddings only."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids,
+        ).last_hidden_state
+
+
+def export_onnx_model(model_name: str, output_dir: str):
+    """Export the transformer to ONNX, quantize it to INT8 and save the tokenizer."""
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Loading {model_name}...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    sample = tokenizer(["ONNX export sample"], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, "model-fp32.onnx")
+    print("Exporting FP32 ONNX model...")
+    with torch.no_grad():
+        torch.onnx.export(
+            _TokenEmbeddings(model),
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            dynamo=False,
+        )
+
+    print("Quantizing to INT8...")
+    quantize_dynamic(fp32_path, os.path.join(output_dir, "model.onnx"), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+    tokenizer.save_pretrained(output_dir)
+    print(f"✓ Quantized model written to {output_dir}")
+    print(f"  Set EMBEDDING_ONNX_DIR={output_dir} to enable it")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--output-dir", default="./models/minilm-int8")
+    args = parser.parse_args()
+
+    export_onnx_model(args.model, args.output_dir)
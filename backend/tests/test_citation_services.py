@@ -5,9 +5,10 @@ from unittest.mock import Mock, patch, AsyncMock
 from datetime import datetime
 
 from app.services.text_analysis import TextAnalysisService, TextContext
-from app.services.embedding import EmbeddingService
+from app.services.embedding import EmbeddingService, get_embedding_service
 from app.services.vector_search import VectorSearchService, SearchOptions, SearchResult
 from app.services.citation_engine import RankingService, CitationEngine
+from app.services import vector_search_v2
 
 
 class TestTextAnalysisService:
@@ -95,8 +96,9 @@ class TestEmbeddingService:
         
         # Generate hash
         text_hash = service._text_to_hash(text)
-        assert isinstance(text_hash, str)
-        assert len(text_hash) == 32  # MD5 hash length
+        assert isinstance(text_hash, int)
+        assert text_hash == service._text_to_hash(text)  # Stable across calls
+        assert text_hash != service._text_to_hash("Other text")
         
         # Test cache miss
         cached = service.get_cached_embedding(text)
@@ -108,6 +110,62 @@ class TestEmbeddingService:
         service = EmbeddingService()
         embeddings = await service.generate_batch_embeddings([])
         assert embeddings == []
+    
+    def test_precompute_common_embeddings_batches(self):
+        """Test common texts are embedded with batched encode calls."""
+        with patch('app.services.embedding.SentenceTransformer') as mock_model_cls:
+            model = mock_model_cls.return_value
+            model.get_sentence_embedding_dimension.return_value = 384
+            model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 384), dtype=np.float32)
+            service = EmbeddingService()
+            texts = [f"common text {i}" for i in range(300)]
+            
+            embeddings = service.precompute_common_embeddings(texts)
+        
+        assert len(embeddings) == 300
+        assert model.encode.call_count == 2  # 256 + 44
+        assert embeddings["common text 0"].shape == (384,)
+    
+    @pytest.mark.asyncio
+    async def test_batch_embeddings_reuse_cached_and_repeated_texts(self):
+        """Test that repeated and previously embedded texts skip the model."""
+        with patch('app.services.embedding.SentenceTransformer') as mock_model_cls:
+            model = mock_model_cls.return_value
+            model.get_sentence_embedding_dimension.return_value = 384
+            model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 384), dtype=np.float32)
+            service = EmbeddingService()
+            
+            first = await service.generate_batch_embeddings(["same", "other", "same"])
+            second = await service.generate_batch_embeddings(["other", "new"])
+        
+        assert [call.args[0] for call in model.encode.call_args_list] == [["same", "other"], ["new"]]
+        assert first[0] is first[2]
+        assert second[0] is first[1]
+        assert service.get_cached_embedding("new") is second[1]
+    
+    def test_cache_evicts_least_recently_used(self):
+        """Test the embedding cache stays within its size limit."""
+        with patch('app.services.embedding.SentenceTransformer'):
+            service = EmbeddingService()
+        service._cache_size = 2
+        
+        for text in ["a", "b"]:
+            service._cache_embedding(service._text_to_hash(text), np.zeros(3, dtype=np.float32))
+        service.get_cached_embedding("a")  # Mark "a" recently used
+        service._cache_embedding(service._text_to_hash("c"), np.zeros(3, dtype=np.float32))
+        
+        assert service.get_cached_embedding("b") is None
+        assert service.get_cached_embedding("a") is not None
+    
+    def test_shared_service(self):
+        """Test the model is loaded once per process."""
+        get_embedding_service.cache_clear()
+        try:
+            with patch('app.services.embedding.EmbeddingService') as mock_service:
+                assert get_embedding_service() is get_embedding_service()
+                mock_service.assert_called_once()
+        finally:
+            get_embedding_service.cache_clear()
 
 
 class TestVectorSearchService:
@@ -147,6 +205,28 @@ class TestVectorSearchService:
         assert results[0].paper_id == "paper1"
         assert results[0].similarity == 0.95
     
+    @pytest.mark.asyncio
+    async def test_search_binds_embedding_and_filters(self):
+        """Test the embedding and filters are bound, so the SQL text is reused across queries."""
+        mock_db = AsyncMock()
+        mock_db.execute.return_value.fetchall = Mock(return_value=[])
+        service = vector_search_v2.VectorSearchService(mock_db)
+        
+        for value in (0.1, 0.2):
+            await service.search_similar_chunks(
+                np.full(384, value, dtype=np.float32), "test-user",
+                vector_search_v2.SearchOptions(limit=5, filters={"year_from": "2020"})
+            )
+        
+        (first_query, first_params), (second_query, second_params) = [
+            call.args for call in mock_db.execute.await_args_list
+        ]
+        assert first_query is second_query
+        assert ":embedding" in first_query.text and "0.1" not in first_query.text
+        assert first_params["year_from"] == 2020 and first_params["limit"] == 5
+        assert "year_to" not in first_query.text
+        assert second_params["embedding"][0] == pytest.approx(0.2)
+    
     def test_search_options(self):
         """Test search options configuration."""
         options = SearchOptions(
@@ -252,6 +332,81 @@ class TestRankingService:
         assert len(citations) > 0
         assert citations[0].paper_id == "1"  # Higher relevance should be first
         assert citations[0].confidence > citations[1].confidence if len(citations) > 1 else True
+    
+    def test_rank_results_limit_respects_paper_cap(self):
+        """Top-k selection still applies the per-paper cap and looks past capped chunks."""
+        results = [
+            SearchResult(
+                paper_id="dominant", title="Dominant", authors=["A"], year=2024,
+                abstract="", similarity=0.99 - i * 0.001, chunk_text="", chunk_index=i,
+                metadata={"chunk_id": f"d{i}"}
+            )
+            for i in range(6)
+        ] + [
+            SearchResult(
+                paper_id=f"other-{i}", title="Other", authors=["B"], year=2024,
+                abstract="", similarity=0.8 - i * 0.01, chunk_text="", chunk_index=0,
+                metadata={"chunk_id": f"o{i}"}
+            )
+            for i in range(3)
+        ]
+        context = TextContext(current_sentence="query", paragraph="")
+        
+        citations = self.service.rank_results(results, context, limit=2, max_chunks_per_paper=1)
+        
+        assert [c.chunk_id for c in citations] == ["d0", "o0"]
+        assert citations[0].confidence >= citations[1].confidence
+    
+    def test_rank_results_filters_low_relevance(self):
+        """Results at or below the relevance cutoff never become citations."""
+        results = [
+            SearchResult(
+                paper_id="weak", title="Weak", authors=[], year=1950,
+                abstract="", similarity=0.0, chunk_text="", chunk_index=0, metadata={}
+            ),
+            SearchResult(
+                paper_id="strong", title="Strong", authors=[], year=datetime.now().year,
+                abstract="", similarity=0.95, chunk_text="", chunk_index=0, metadata={}
+            ),
+        ]
+        context = TextContext(current_sentence="query", paragraph="")
+        
+        citations = self.service.rank_results(results, context)
+        
+        assert [c.paper_id for c in citations] == ["strong"]
+        assert all(c.confidence > RankingService.MIN_RELEVANCE for c in citations)
+    
+    def test_batch_scores_match_single_result_scoring(self):
+        """Vectorized ranking gives the same scores as scoring results one at a time."""
+        current_year = datetime.now().year
+        results = [
+            SearchResult(
+                paper_id=str(i), title=f"Neural ranking paper {i}", authors=["A"],
+                year=current_year - age, abstract="neural ranking of citations",
+                similarity=sim, chunk_text="", chunk_index=0,
+                metadata={"citation_count": count, "venue_rank": "B"}
+            )
+            for i, (age, sim, count) in enumerate([(1, 0.95, 500), (4, 0.9, None), (30, 0.85, 20)])
+        ]
+        context = TextContext(
+            current_sentence="Neural ranking",
+            previous_sentence="Prior neural work",
+            paragraph="Neural ranking of citations"
+        )
+        
+        citations = self.service.rank_results(list(results), context)
+        by_id = {r.paper_id: r for r in results}
+        
+        assert len(citations) == 3
+        for citation in citations:
+            result = by_id[citation.paper_id]
+            assert citation.confidence == pytest.approx(self.service.calculate_relevance(result, context))
+            assert citation.relevance_scores["context"] == pytest.approx(
+                self.service._calculate_context_score(result, context)
+            )
+            assert citation.relevance_scores["recency"] == pytest.approx(
+                self.service._calculate_recency_score(result.year)
+            )
 
 
 @pytest.mark.asyncio
@@ -291,4 +446,111 @@ async def test_citation_engine_integration():
         assert len(suggestions) > 0
         assert suggestions[0].title == "Test Paper for Citations"
         assert suggestions[0].confidence > 0.5
-        assert suggestions[0].display_text == "(Test Author, 2023)"
\ No newline at end of file
+        assert suggestions[0].display_text == "(Test Author, 2023)"
+
+class TestCitationEngineCache:
+    """Tests for citation suggestion caching."""
+    
+    def test_cache_key_is_stable(self):
+        """Cache keys must not depend on the per-process hash seed."""
+        context = TextContext(current_sentence="some text", paragraph="some text")
+        options = SearchOptions()
+        key = CitationEngine._cache_key("user-1", "some text", context, options)
+        assert key == CitationEngine._cache_key("user-1", "some text", context, options)
+        assert key.startswith("citations:user-1:")
+        assert len(key.rsplit(":", 1)[1]) == 32
+        assert key != CitationEngine._cache_key("user-2", "some text", context, options)
+    
+    def test_cache_key_covers_context_and_options(self):
+        """Requests that rank differently must not share a cache entry."""
+        context = TextContext(current_sentence="some text", paragraph="first paragraph")
+        key = CitationEngine._cache_key("user-1", "some text", context, SearchOptions())
+        
+        other_paragraph = TextContext(current_sentence="some text", paragraph="second paragraph")
+        assert key != CitationEngine._cache_key("user-1", "some text", other_paragraph, SearchOptions())
+        assert key != CitationEngine._cache_key("user-1", "some text", context, SearchOptions(limit=5))
+        assert key != CitationEngine._cache_key(
+            "user-1", "some text", context, SearchOptions(filters={"year_min": 2020})
+        )
+    
+    @pytest.mark.asyncio
+    async def test_cache_roundtrip(self):
+        """Stored suggestions are returned on hit without re-running the search."""
+        store = {}
+        
+        class FakePipeline:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *args):
+                return False
+            
+            def setex(self, key, ttl, value):
+                store[key] = value
+            
+            def sadd(self, key, *members):
+                pass
+            
+            def expire(self, key, ttl):
+                pass
+            
+            async def execute(self):
+                return []
+        
+        redis_client = Mock()
+        redis_client.get = AsyncMock(side_effect=lambda key: store.get(key))
+        redis_client.pipeline = Mock(return_value=FakePipeline())
+        
+        with patch('app.services.citation_engine.get_embedding_service') as mock_embedding, \
+             patch('app.services.citation_engine.redis.from_url', return_value=redis_client), \
+             patch('app.services.citation_engine.VectorSearchService') as mock_search:
+            generate = mock_embedding.return_value.generate_embedding = AsyncMock(return_value=np.zeros(384))
+            engine = CitationEngine(AsyncMock())
+            search = mock_search.return_value.search_similar_chunks = AsyncMock(return_value=[
+                SearchResult(
+                    paper_id="cached-paper", title="Cached Paper", authors=["Jane Doe"],
+                    year=2024, abstract="Abstract", similarity=0.9,
+                    chunk_text="Chunk", chunk_index=1, metadata={"chunk_id": "c1"}
+                )
+            ])
+            context = TextContext(current_sentence="Cached text", paragraph="")
+            
+            first = await engine.get_suggestions("Cached text", context, "user-1")
+            second = await engine.get_suggestions("Cached text", context, "user-1")
+        
+        assert search.await_count == 1
+        assert generate.await_count == 1  # A hit doesn't run the model
+        assert second == first
+        assert second[0].chunk_id == "c1"
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_computation(self):
+        """Identical concurrent requests run the search pipeline once."""
+        import asyncio
+        
+        async def slow_search(**kwargs):
+            await asyncio.sleep(0.01)
+            return [
+                SearchResult(
+                    paper_id="p1", title="Shared Paper", authors=["Jane Doe"],
+                    year=2024, abstract="Abstract", similarity=0.9,
+                    chunk_text="Chunk", chunk_index=0, metadata={}
+                )
+            ]
+        
+        with patch('app.services.citation_engine.get_embedding_service') as mock_embedding, \
+             patch('app.services.citation_engine.redis.from_url', side_effect=RuntimeError("no redis")), \
+             patch('app.services.citation_engine.VectorSearchService') as mock_search:
+            mock_embedding.return_value.generate_embedding = AsyncMock(return_value=np.zeros(384))
+            search = mock_search.return_value.search_similar_chunks = AsyncMock(side_effect=slow_search)
+            context = TextContext(current_sentence="Shared text", paragraph="")
+            
+            first, second = await asyncio.gather(
+                CitationEngine(AsyncMock()).get_suggestions("Shared text", context, "user-1"),
+                CitationEngine(AsyncMock()).get_suggestions("Shared text", context, "user-1"),
+            )
+        
+        assert search.await_count == 1
+        assert first == second
+        assert CitationEngine._inflight == {}
+
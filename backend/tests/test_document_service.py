@@ -0,0 +1,126 @@
+"""Unit tests for DocumentService helpers that don't need a database."""
+import pytest
+from uuid import uuid4
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+
+from app.services.document import DocumentService, DocumentAccessTracker
+
+
+class TestLexicalTextExtraction:
+    """Tests for extracting plain text from Lexical content."""
+    
+    def test_extracts_text_in_document_order(self):
+        """Test text nodes are joined in reading order."""
+        content = {
+            "root": {
+                "type": "root",
+                "children": [
+                    {"type": "heading", "children": [{"type": "text", "text": "Intro"}]},
+                    {"type": "paragraph", "children": [
+                        {"type": "text", "text": "First  part"},
+                        {"type": "text", "text": "second part"},
+                    ]},
+                ],
+            }
+        }
+        
+        plain_text, word_count = DocumentService._extract_text_and_word_count(content)
+        
+        assert plain_text == "Intro First  part second part"
+        assert word_count == len(plain_text.split())
+        assert DocumentService._extract_plain_text(content) == plain_text
+    
+    def test_deeply_nested_content(self):
+        """Test that deep trees don't hit the recursion limit."""
+        node = {"type": "text", "text": "deep"}
+        for _ in range(5000):
+            node = {"type": "paragraph", "children": [node]}
+        
+        assert DocumentService._extract_text_and_word_count({"root": node}) == ("deep", 1)
+    
+    def test_missing_root(self):
+        """Test content without a root yields no text."""
+        assert DocumentService._extract_text_and_word_count({}) == ("", 0)
+    
+    def test_serialized_content(self):
+        """Test content passed as a JSON string or bytes is decoded first."""
+        raw = '{"root": {"children": [{"type": "text", "text": "from json"}]}}'
+        
+        assert DocumentService._extract_plain_text(raw) == "from json"
+        assert DocumentService._extract_plain_text(raw.encode()) == "from json"
+
+
+def _mock_session_factory():
+    session = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.__aenter__.return_value = session
+    return factory, session
+
+
+class TestDocumentAccessTracker:
+    """Tests for DocumentAccessTracker."""
+    
+    @pytest.mark.asyncio
+    async def test_flush_coalesces_accesses(self):
+        """Repeated accesses are written with a single UPDATE."""
+        tracker = DocumentAccessTracker()
+        doc_a, doc_b = uuid4(), uuid4()
+        for document_id in (doc_a, doc_b, doc_a):
+            tracker.record(document_id)
+        
+        factory, session = _mock_session_factory()
+        with patch('app.services.document.AsyncSessionLocal', factory):
+            await tracker.flush()
+            await tracker.flush()  # Nothing pending - no second round trip
+        
+        assert session.execute.await_count == 1
+        session.commit.assert_awaited_once()
+        params = session.execute.await_args.args[0].compile().params
+        assert set(params["id_1"]) == {doc_a, doc_b}
+    
+    @pytest.mark.asyncio
+    async def test_flush_failure_is_logged(self):
+        """A failed flush doesn't raise into the caller."""
+        tracker = DocumentAccessTracker()
+        tracker.record(uuid4())
+        
+        factory, session = _mock_session_factory()
+        session.execute.side_effect = RuntimeError("db down")
+        with patch('app.services.document.AsyncSessionLocal', factory):
+            await tracker.flush()
+        
+        session.commit.assert_not_awaited()
+
+
+class TestGetDocuments:
+    """Tests for paginated document listing."""
+    
+    @pytest.mark.asyncio
+    async def test_single_round_trip(self):
+        """Rows and total come from one windowed query."""
+        doc_a, doc_b = Mock(), Mock()
+        result = Mock()
+        result.all.return_value = [Mock(__getitem__=lambda s, i: doc_a, total=7),
+                                   Mock(__getitem__=lambda s, i: doc_b, total=7)]
+        db = AsyncMock()
+        db.execute.return_value = result
+        
+        documents, total = await DocumentService.get_documents(db, user_id=uuid4(), search="neural")
+        
+        assert documents == [doc_a, doc_b]
+        assert total == 7
+        assert db.execute.await_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_page_past_end_falls_back_to_count(self):
+        """An empty page past the end still reports the real total."""
+        empty, count = Mock(), Mock()
+        empty.all.return_value = []
+        count.scalar.return_value = 12
+        db = AsyncMock()
+        db.execute.side_effect = [empty, count]
+        
+        documents, total = await DocumentService.get_documents(db, skip=40, limit=20)
+        
+        assert documents == []
+        assert total == 12
@@ -0,0 +1,268 @@
+"""Unit tests for BibTeX and LaTeX export."""
+import re
+import pytest
+from datetime import datetime
+from uuid import uuid4
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+
+from app.models.document import Document
+from app.models.document_paper import DocumentPaper
+from app.models.paper import Paper
+from app.services import export_service
+from app.services.export_service import ExportService
+
+
+def _paper(**kwargs):
+    defaults = dict(
+        title="Attention Is All You Need",
+        authors=["Ashish Vaswani", "Noam Shazeer"],
+        year=2017,
+        journal="NeurIPS",
+        doi="10.5555/attention",
+    )
+    defaults.update(kwargs)
+    return Paper(**defaults)
+
+
+def _bibtex_db(title, doc_papers, assignments_hash="hash-1"):
+    """Mock a session answering the document probe and then the paper load."""
+    probe = Mock()
+    probe.one_or_none.return_value = (
+        None if title is None else (title, len(doc_papers), datetime(2025, 1, 1), assignments_hash)
+    )
+    papers = Mock()
+    papers.scalars.return_value.all.return_value = doc_papers
+    db = AsyncMock()
+    db.execute.side_effect = [probe, papers]
+    return db
+
+
+async def _bibtex(db, document_id):
+    chunks = await ExportService.export_document_bibtex(db, document_id, uuid4())
+    return "".join([chunk async for chunk in chunks])
+
+
+def _lexical(*children):
+    return {"root": {"type": "root", "children": list(children)}}
+
+
+def _text(text, fmt=0):
+    return {"type": "text", "text": text, "format": fmt}
+
+
+class TestBibtexExport:
+    """Tests for BibTeX generation."""
+
+    def test_citation_key(self):
+        """Test key is last name + year + first non-stopword of the title."""
+        assert ExportService._generate_citation_key(_paper()) == "Vaswani2017Attention"
+        assert ExportService._generate_citation_key(
+            _paper(authors=["Jean-Luc O'Neil"], year=None, title="The 3D World")
+        ) == "ONeil0000D"
+        assert ExportService._generate_citation_key(_paper(authors=[], title="On the Origin")) == "Unknown2017Origin"
+        assert ExportService._generate_citation_key(
+            _paper(authors=["Jürgen Müller"], title="Über 42 Graph-Based Models")
+        ) == "Mller2017ber"
+
+    def test_entry_fields(self):
+        """Test entry type, fields and the trailing-comma-free last field."""
+        entry = ExportService._generate_bibtex_entry(
+            _paper(arxiv_id="1706.03762", abstract='Line one\nsays "hi"')
+        )
+        lines = entry.rstrip("\n").split("\n")
+
+        assert lines[0] == "@misc{Vaswani2017Attention,"
+        assert "  title = {Attention Is All You Need}," in lines
+        assert "  author = {Ashish Vaswani and Noam Shazeer}," in lines
+        assert "  howpublished = {NeurIPS}," in lines
+        assert "  eprint = {1706.03762}," in lines
+        assert "  archivePrefix = {arXiv}," in lines
+        assert lines[-2] == "  abstract = {Line one says ''hi''}"
+        assert lines[-1] == "}"
+
+    @pytest.mark.asyncio
+    async def test_export_document(self):
+        """Test the export includes a header and one entry per assigned paper in order."""
+        doc_papers = [
+            DocumentPaper(position=0, paper=_paper(), notes="Key reference"),
+            DocumentPaper(position=1, paper=_paper(title="BERT", authors=["Jacob Devlin"], year=2019, doi=None)),
+        ]
+        db = _bibtex_db("My Thesis", doc_papers)
+
+        bibtex = await _bibtex(db, uuid4())
+
+        assert "% BibTeX export for document: My Thesis" in bibtex
+        assert "% Total papers: 2" in bibtex
+        assert re.search(r"% Generated on: \d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\n", bibtex)
+        assert "% Notes: Key reference\n@article{Vaswani2017Attention," in bibtex
+        assert bibtex.index("Vaswani2017Attention") < bibtex.index("Devlin2019BERT")
+        assert "}\n\n@article{Devlin2019BERT," in bibtex
+        assert "\n\n\n" not in bibtex
+        assert bibtex.endswith("}\n")
+        assert db.execute.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_export_is_cached_per_assignment_fingerprint(self):
+        """Test unchanged assignments reuse cached entries and changed ones reload."""
+        document_id = uuid4()
+        doc_papers = [DocumentPaper(position=0, paper=_paper())]
+        first = await _bibtex(_bibtex_db("My Thesis", doc_papers), document_id)
+
+        cached_db = _bibtex_db("Renamed", doc_papers)
+        cached = await _bibtex(cached_db, document_id)
+
+        assert cached_db.execute.await_count == 1
+        assert "% BibTeX export for document: Renamed" in cached
+        assert cached.split("% Total papers: 1")[1] == first.split("% Total papers: 1")[1]
+
+        changed_db = _bibtex_db("My Thesis", [DocumentPaper(position=0, paper=_paper(), notes="New")], "hash-2")
+        changed = await _bibtex(changed_db, document_id)
+
+        assert changed_db.execute.await_count == 2
+        assert "% Notes: New" in changed
+
+    @pytest.mark.asyncio
+    async def test_large_export_streams_in_batches(self):
+        """Test large bibliographies stream from their own session and are not cached."""
+        doc_papers = [DocumentPaper(position=i, paper=_paper(year=2000 + i)) for i in range(3)]
+
+        class _StreamResult:
+            async def _rows(self):
+                for doc_paper in doc_papers:
+                    yield doc_paper
+
+            def scalars(self):
+                return self._rows()
+
+        session = AsyncMock()
+        session.stream.return_value = _StreamResult()
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__.return_value = session
+        db = _bibtex_db("Big", doc_papers)
+        document_id = uuid4()
+
+        with patch("app.services.export_service._BIBTEX_STREAM_THRESHOLD", 2), \
+                patch("app.services.export_service.AsyncSessionLocal", session_factory):
+            bibtex = await _bibtex(db, document_id)
+
+        assert db.execute.await_count == 1
+        stmt = session.stream.await_args.args[0]
+        assert stmt.get_execution_options()["yield_per"] == 500
+        assert [f"Vaswani{2000 + i}Attention" in bibtex for i in range(3)] == [True] * 3
+        assert not any(key[0] == document_id for key in export_service._bibtex_cache)
+
+    @pytest.mark.asyncio
+    async def test_export_without_papers(self):
+        """Test a document without papers gets a placeholder comment."""
+        db = _bibtex_db("Empty", [])
+
+        bibtex = await _bibtex(db, uuid4())
+
+        assert bibtex == "% No papers assigned to this document\n"
+        assert db.execute.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_export_missing_document(self):
+        """Test a missing document raises ValueError."""
+        with pytest.raises(ValueError):
+            await ExportService.export_document_bibtex(_bibtex_db(None, []), uuid4(), uuid4())
+
+
+class TestLatexExport:
+    """Tests for Lexical to LaTeX conversion."""
+
+    def test_escape_latex(self):
+        """Test special characters are escaped without double-escaping."""
+        assert ExportService._escape_latex("50% of $x_1$ & {y}") == "50\\% of \\$x\\_1\\$ \\& \\{y\\}"
+        assert ExportService._escape_latex("a\\b~") == "a\\textbackslash{}b\\textasciitilde{}"
+        assert ExportService._escape_latex("") == ""
+
+    def test_convert_content(self):
+        """Test headings, formatted text, citations, lists, quotes and code."""
+        content = _lexical(
+            {"type": "heading", "tag": "h2", "children": [_text("Related Work")]},
+            {"type": "paragraph", "children": [
+                _text("Plain"), _text("bold", 1), _text("italic", 2),
+                {"type": "citation", "citationKey": "Vaswani2017Attention"},
+            ]},
+            {"type": "list", "listType": "number", "children": [
+                {"type": "listitem", "children": [_text("first")]},
+                {"type": "listitem", "children": [{"type": "paragraph", "children": [_text("second")]}]},
+            ]},
+            {"type": "quote", "children": [_text("quoted")]},
+            {"type": "code", "text": "x = 1"},
+        )
+
+        latex = ExportService._convert_lexical_to_latex(content)
+
+        assert latex.split("\n\n") == [
+            "\\subsection{Related Work}",
+            "Plain \\textbf{bold} \\textit{italic} \\cite{Vaswani2017Attention}",
+            "\\begin{enumerate}\n  \\item first\n  \\item second\n\\end{enumerate}",
+            "\\begin{quote}\nquoted\n\\end{quote}",
+            "\\begin{verbatim}\nx = 1\n\\end{verbatim}",
+        ]
+
+    def test_combined_text_formats(self):
+        """Test format bits nest instead of bold masking italic."""
+        content = _lexical({"type": "paragraph", "children": [
+            _text("both", 1 | 2), _text("code_x", 16), _text("under", 8 | 4),
+        ]})
+
+        assert ExportService._convert_lexical_to_latex(content) == (
+            "\\textit{\\textbf{both}} \\texttt{code\\_x} \\underline{under}"
+        )
+
+    def test_citation_fallbacks(self):
+        """Test citation nodes fall back to paper ids and then to 'unknown'."""
+        content = _lexical(
+            {"type": "citation", "paper_id": "p-1"},
+            {"type": "paragraph", "children": [{"type": "citation"}]},
+        )
+
+        assert ExportService._convert_lexical_to_latex(content) == "\\cite{p-1}\n\n\\cite{unknown}"
+
+    def test_unknown_nodes_use_children_text(self):
+        """Test unknown node types fall back to their children."""
+        content = _lexical(
+            {"type": "custom", "children": [{"type": "paragraph", "children": [_text("nested")]}]},
+            {"type": "heading", "tag": "h9", "children": [_text("Deep")]},
+        )
+
+        assert ExportService._convert_lexical_to_latex(content) == "nested\n\n\\paragraph{Deep}"
+
+    @pytest.mark.asyncio
+    async def test_export_document_latex(self):
+        """Test the LaTeX document wrapper and bibliography reference."""
+        document = Document(
+            id=uuid4(), title="My Thesis", description="About 100%",
+            content=_lexical({"type": "paragraph", "children": [_text("Body")]})
+        )
+        result = Mock()
+        result.one_or_none.return_value = (document, True)
+        db = AsyncMock()
+        db.execute.return_value = result
+
+        latex = await ExportService.export_document_latex(db, document.id, uuid4())
+
+        assert "\\title{My Thesis}" in latex
+        assert "\\begin{abstract}\nAbout 100\\%\n\\end{abstract}" in latex
+        assert "\nBody\n" in latex
+        assert "\\bibliography{My_Thesis_bibliography}" in latex
+        assert latex.endswith("\\end{document}")
+        assert db.execute.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_export_document_latex_without_papers(self):
+        """Test the bibliography is omitted when the document has no papers."""
+        document = Document(id=uuid4(), title="Draft", plain_text="Just text")
+        result = Mock()
+        result.one_or_none.return_value = (document, False)
+        db = AsyncMock()
+        db.execute.return_value = result
+
+        latex = await ExportService.export_document_latex(db, document.id, uuid4())
+
+        assert "Just text" in latex
+        assert "\\bibliography" not in latex
+        assert db.execute.await_count == 1
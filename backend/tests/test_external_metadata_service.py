@@ -1,15 +1,69 @@
 """Tests for external metadata fetching service."""
+import asyncio
+import orjson
 import pytest
 import pytest_asyncio
 from unittest.mock import Mock, patch, AsyncMock
-import xml.etree.ElementTree as ET
+from lxml import etree
+from app.services import external_metadata_service
 from app.services.external_metadata_service import (
     ArxivClient, 
     CrossrefClient, 
-    MetadataFetcherService
+    MetadataFetcherService,
+    get_http_client,
+    close_http_client
 )
 
 
+@pytest.fixture(autouse=True)
+def clear_metadata_cache():
+    """Start every test with an empty response cache."""
+    external_metadata_service._metadata_cache.clear()
+    yield
+    external_metadata_service._metadata_cache.clear()
+
+
+class TestHttpClient:
+    """Test the shared HTTP client."""
+    
+    @pytest.mark.asyncio
+    async def test_client_is_shared_until_closed(self):
+        """Test all fetches reuse one pooled client."""
+        client = get_http_client()
+        assert get_http_client() is client
+        
+        await close_http_client()
+        assert client.is_closed
+        assert get_http_client() is not client
+        await close_http_client()
+    
+    @pytest.mark.asyncio
+    async def test_requests_bounded_per_host(self):
+        """Test concurrent fetches to one host never exceed its limit."""
+        in_flight = 0
+        peak = 0
+        
+        async def slow_get(*args, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            response = Mock(status_code=404)
+            return response
+        
+        mock_client = AsyncMock()
+        mock_client.get = slow_get
+        client = CrossrefClient()
+        
+        with patch('app.services.external_metadata_service._host_semaphores', {}), \
+                patch.dict('app.services.external_metadata_service.HOST_CONCURRENCY_LIMITS', {"crossref": 3}), \
+                patch('app.services.external_metadata_service.get_http_client', return_value=mock_client):
+            await asyncio.gather(*(client.fetch_by_doi(f"10.1234/{i}") for i in range(10)))
+        
+        assert peak == 3
+
+
 class TestArxivClient:
     """Test ArXiv API client."""
     
@@ -42,7 +96,7 @@ class TestArxivClient:
             <category term="cs.LG"/>
         </entry>
         """
-        entry = ET.fromstring(xml_data)
+        entry = etree.fromstring(xml_data)
         
         metadata = client._extract_metadata_from_entry(entry)
         
@@ -59,7 +113,7 @@ class TestArxivClient:
     async def test_fetch_by_id_success(self, client):
         """Test successful fetch by arXiv ID."""
         mock_response = Mock()
-        mock_response.text = """<?xml version="1.0" encoding="UTF-8"?>
+        mock_response.content = b"""<?xml version="1.0" encoding="UTF-8"?>
         <feed xmlns="http://www.w3.org/2005/Atom">
             <entry>
                 <title>Real Paper Title</title>
@@ -69,13 +123,10 @@ class TestArxivClient:
             </entry>
         </feed>"""
         
-        with patch('httpx.AsyncClient') as mock_client_class:
-            mock_client_instance = AsyncMock()
-            mock_client_instance.get = AsyncMock(return_value=mock_response)
-            mock_client_instance.__aenter__ = AsyncMock(return_value=mock_client_instance)
-            mock_client_instance.__aexit__ = AsyncMock(return_value=None)
-            mock_client_class.return_value = mock_client_instance
-            
+        mock_client = AsyncMock()
+        mock_client.get = AsyncMock(return_value=mock_response)
+        
+        with patch('app.services.external_metadata_service.get_http_client', return_value=mock_client):
             metadata = await client.fetch_by_id("2306.12345")
             
             assert metadata is not None
@@ -134,7 +185,7 @@ class TestCrossrefClient:
         """Test successful fetch by DOI."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.json = Mock(return_value={
+        mock_response.content = orjson.dumps({
             'message': {
                 'title': ['Paper Title'],
                 'author': [{'given': 'A', 'family': 'Author'}],
@@ -142,19 +193,31 @@ class TestCrossrefClient:
             }
         })
         
-        with patch('httpx.AsyncClient') as mock_client_class:
-            mock_client_instance = AsyncMock()
-            mock_client_instance.get = AsyncMock(return_value=mock_response)
-            mock_client_instance.__aenter__ = AsyncMock(return_value=mock_client_instance)
-            mock_client_instance.__aexit__ = AsyncMock(return_value=None)
-            mock_client_class.return_value = mock_client_instance
-            
+        mock_client = AsyncMock()
+        mock_client.get = AsyncMock(return_value=mock_response)
+        
+        with patch('app.services.external_metadata_service.get_http_client', return_value=mock_client):
             metadata = await client.fetch_by_doi("10.1234/test")
             
             assert metadata is not None
             assert metadata['title'] == 'Paper Title'
             assert metadata['doi'] == '10.1234/test'
             assert metadata['source'] == 'crossref'
+    
+    @pytest.mark.asyncio
+    async def test_fetch_by_doi_is_cached(self, client):
+        """Test repeated DOIs are served from the cache as independent copies."""
+        mock_response = Mock(status_code=200, content=orjson.dumps({'message': {'title': ['Paper Title']}}))
+        mock_client = AsyncMock()
+        mock_client.get = AsyncMock(return_value=mock_response)
+        
+        with patch('app.services.external_metadata_service.get_http_client', return_value=mock_client):
+            first = await client.fetch_by_doi("10.1234/test")
+            first['title'] = 'Changed by caller'
+            second = await CrossrefClient().fetch_by_doi("https://doi.org/10.1234/test")
+        
+        assert mock_client.get.await_count == 1
+        assert second['title'] == 'Paper Title'
 
 
 class TestMetadataFetcherService:
@@ -204,6 +267,23 @@ class TestMetadataFetcherService:
         assert metadata['abstract'] == 'This is the abstract.'
         assert metadata['source'] == 'bibtex'
     
+    def test_parse_bibtex_falls_back_to_bibtexparser(self, service):
+        """Test entries the regex fast path cannot read are parsed by bibtexparser."""
+        bibtex = """@article{test2024,
+            title = "M{\\"u}ller's {Test} Paper",
+            year = 2024
+        }
+        """
+        
+        metadata = service.parse_bibtex(bibtex)
+        
+        assert metadata['title'] == "Müller's Test Paper"
+        assert metadata['year'] == 2024
+        
+        # A second call must not see entries from the first
+        metadata = service.parse_bibtex("""@article{other, title = "Other"}""")
+        assert metadata['title'] == 'Other'
+    
     @pytest.mark.asyncio
     async def test_fetch_metadata_arxiv_first(self, service):
         """Test that arXiv is tried first when available."""
@@ -0,0 +1,42 @@
+"""Unit tests for paper text chunking."""
+from app.services.paper_processor import TextChunkingService
+
+
+class TestTextChunkingService:
+    """Tests for word-window chunking with overlap."""
+
+    def setup_method(self):
+        self.service = TextChunkingService()
+
+    def test_chunks_overlap_by_word_count(self):
+        """Test that consecutive chunks share overlap_size words."""
+        text = " ".join(f"w{i}" for i in range(10))
+
+        chunks = self.service.chunk_text(text, chunk_size=4, overlap_size=1)
+
+        assert [c.content for c in chunks] == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9", "w9"]
+        assert [c.word_count for c in chunks] == [4, 4, 4, 1]
+        assert [c.position for c in chunks] == [0, 1, 2, 3]
+
+    def test_chunk_offsets_slice_the_original_text(self):
+        """Test that start_char/end_char locate each chunk in the source text."""
+        text = "  alpha beta\n\ngamma   delta epsilon \n"
+
+        chunks = self.service.chunk_text(text, chunk_size=3, overlap_size=0)
+
+        assert [c.content for c in chunks] == ["alpha beta\n\ngamma", "delta epsilon"]
+        for chunk in chunks:
+            assert text[chunk.start_char:chunk.end_char] == chunk.content
+
+    def test_section_title_from_heading_line(self):
+        """Test that a chunk starting with a section heading carries it forward."""
+        text = "1 Introduction\nword word word word\nmore words here"
+
+        chunks = self.service.chunk_text(text, chunk_size=5, overlap_size=0)
+
+        assert chunks[0].section_title == "1 Introduction"
+        assert chunks[1].section_title == "1 Introduction"
+
+    def test_empty_text(self):
+        """Test that whitespace-only text yields no chunks."""
+        assert self.service.chunk_text(" \n\t ") == []
@@ -46,6 +46,15 @@ def test_websocket_connection():
         assert data["type"] == "pong"
 
 
+def test_websocket_binary_frames():
+    """Test JSON messages sent in binary frames are accepted."""
+    with client.websocket_connect("/ws/citations?user_id=test-user") as websocket:
+        websocket.send_json({"type": "ping"}, mode="binary")
+        
+        data = websocket.receive_json()
+        assert data["type"] == "pong"
+
+
 def test_websocket_suggestion_request(mock_citation_engine):
     """Test citation suggestion request."""
     with client.websocket_connect("/ws/citations?user_id=test-user") as websocket: